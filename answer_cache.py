@@ -0,0 +1,212 @@
+import streamlit as st
+import numpy as np
+import hashlib
+import re
+import threading
+import time
+
+def normalize(text):
+    # Case, punctuation and spacing don't change the question
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+# Particles and pronouns that don't change what is being asked ("kenapa ya?", "daun saya kuning")
+FILLER_WORDS = frozenset({
+    'ya', 'yah', 'sih', 'dong', 'deh', 'nih', 'loh', 'lho', 'kah', 'lah', 'tuh',
+    'tolong', 'mohon', 'saya', 'aku', 'ku', 'gue', 'min', 'kak', 'pak', 'bu',
+})
+
+# Informal spellings and synonyms asked the same way ("daun saya kok kuning" = "kenapa daun kuning")
+SYNONYMS = {
+    'kok': 'kenapa', 'mengapa': 'kenapa', 'knp': 'kenapa', 'gimana': 'bagaimana', 'gmn': 'bagaimana',
+    'brp': 'berapa', 'gak': 'tidak', 'nggak': 'tidak', 'ngga': 'tidak', 'tak': 'tidak', 'enggak': 'tidak',
+}
+
+MIN_STEM = 4 # Shorter results are left unstemmed ("berapa" is not "apa")
+
+def stem(word):
+    """Strips one common Indonesian suffix and prefix: menguning -> kuning, disiramnya -> siram.
+
+    Deliberately small: a word that isn't stemmed only costs a cache miss, while two
+    different words stemmed alike would serve a wrong answer.
+    """
+    for suffix in ('nya', 'kan', 'an'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    # Nasal prefixes replace the root's first letter before a vowel: menyiram, memupuk, menanam
+    for prefix, before_vowel in (('meny', 's'), ('meng', 'k'), ('mem', 'p'), ('men', 't'),
+                                 ('me', ''), ('ber', ''), ('di', '')):
+        if word.startswith(prefix):
+            rest = word[len(prefix):]
+            root = before_vowel + rest if rest[:1] in ('a', 'e', 'i', 'o', 'u') else rest
+            if len(root) >= MIN_STEM:
+                return root
+            break
+    return word
+
+def canonical_words(text):
+    """Sorted, de-duplicated stems of `text` without filler words; questions asked with the
+    same canonical words get the same answer, whatever their word order or affixes."""
+    words = (SYNONYMS.get(word, word) for word in normalize(text).split() if word not in FILLER_WORDS)
+    return tuple(sorted({stem(word) for word in words}))
+
+def spelling_variants(a, b):
+    """Whether two canonical words are the same word spelled differently (kelembapan/kelembaban).
+
+    Only words of 7+ letters, one edit apart: shorter ones are too often different words
+    ("kompos"/"kompas", "basah"/"basa").
+    """
+    if a == b:
+        return True
+    if min(len(a), len(b)) < 7 or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    # One substitution (same length) or one inserted letter in the longer word
+    return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+
+def same_words(a, b):
+    """Whether every canonical word of `a` pairs with its own spelling variant in `b` and vice versa."""
+    if len(a) != len(b):
+        return False
+    unmatched = list(b)
+    for word in a:
+        match = next((other for other in unmatched if spelling_variants(word, other)), None)
+        if match is None:
+            return False
+        unmatched.remove(match)
+    return True
+
+def embed(text, dim=512, ngram_sizes=(3, 4, 5)):
+    """Local, dependency-free embedding: hashed character n-grams, L2-normalised.
+
+    Taken over the canonical words, so filler, affixes and word order don't lower the
+    similarity; what remains is spelling, which the vector index matches approximately.
+    """
+    padded = f' {" ".join(canonical_words(text))} '
+    vector = np.zeros(dim, dtype=np.float32)
+    for n in ngram_sizes:
+        for i in range(len(padded) - n + 1):
+            digest = hashlib.blake2b(padded[i:i + n].encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % dim
+            sign = 1.0 if digest[4] & 1 else -1.0 # Signed hashing keeps collisions unbiased
+            vector[bucket] += sign
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class AnswerCache:
+    """Exact + near-duplicate answer cache with TTL and LRU eviction.
+
+    Questions with the same canonical words share an exact key ("kenapa daun kuning" /
+    "daun saya kok kuning"). Vectors live in one preallocated matrix, so finding the
+    near-duplicates left (spelling variants) is a single matrix-vector product. The n-gram
+    similarity only measures shared spelling, so a candidate must also have the same words
+    up to spelling: "...tanaman cabai?" never answers "...tanaman tomat?", and "perlu
+    disiram" never answers "tidak perlu disiram".
+    """
+
+    def __init__(self, threshold=0.85, ttl=7 * 24 * 60 * 60, max_entries=1000, dim=512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.__dim = dim
+        self.__vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self.__slots = [None] * max_entries # slot -> {'key', 'answer', 'expires_at', 'last_used'}
+        self.__exact = {} # cache key -> slot
+        self.__lock = threading.Lock()
+        self.__counters = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, question, context=''):
+        """Cached answer for `question` (asked with the same `context`), or None."""
+        key = self.__key(question, context)
+        vector = embed(question, self.__dim)
+        words = canonical_words(question)
+        now = time.time()
+        with self.__lock:
+            slot = self.__exact.get(key)
+            if slot is not None and self.__alive(slot, now):
+                self.__counters['exact_hits'] += 1
+                return self.__use(slot, now)
+
+            scores = self.__vectors @ vector
+            for slot in np.argsort(scores)[::-1]:
+                if scores[slot] < self.threshold:
+                    break
+                entry = self.__slots[slot]
+                # A cached answer only applies to the same words, asked with the same context
+                if (self.__alive(slot, now) and same_words(entry['words'], words)
+                        and entry['context'] == self.__context_digest(context)):
+                    self.__counters['semantic_hits'] += 1
+                    return self.__use(slot, now)
+
+            self.__counters['misses'] += 1
+            return None
+
+    def put(self, question, answer, context=''):
+        key = self.__key(question, context)
+        now = time.time()
+        with self.__lock:
+            slot = self.__exact.get(key)
+            if slot is None:
+                slot = self.__free_slot(now)
+            self.__vectors[slot] = embed(question, self.__dim)
+            self.__slots[slot] = {
+                'key': key,
+                'context': self.__context_digest(context),
+                'words': canonical_words(question),
+                'answer': answer,
+                'expires_at': now + self.ttl,
+                'last_used': now,
+            }
+            self.__exact[key] = slot
+
+    def stats(self):
+        with self.__lock:
+            return dict(self.__counters, size=len(self.__exact))
+
+    def __use(self, slot, now):
+        entry = self.__slots[slot]
+        entry['last_used'] = now
+        return entry['answer']
+
+    def __alive(self, slot, now):
+        entry = self.__slots[slot]
+        if entry is None:
+            return False
+        if entry['expires_at'] <= now:
+            self.__release(slot)
+            return False
+        return True
+
+    def __free_slot(self, now):
+        for slot, entry in enumerate(self.__slots):
+            if entry is None or entry['expires_at'] <= now:
+                if entry is not None:
+                    self.__release(slot)
+                return slot
+        # Full: evict the least recently used answer
+        slot = min(range(len(self.__slots)), key=lambda s: self.__slots[s]['last_used'])
+        self.__release(slot)
+        self.__counters['evictions'] += 1
+        return slot
+
+    def __release(self, slot):
+        self.__exact.pop(self.__slots[slot]['key'], None)
+        self.__slots[slot] = None
+        self.__vectors[slot] = 0 # A zero vector never reaches the threshold
+
+    @classmethod
+    def __key(cls, question, context):
+        # A question of filler words only falls back to its own text
+        return f"{cls.__context_digest(context)}:{' '.join(canonical_words(question)) or normalize(question)}"
+
+    @staticmethod
+    def __context_digest(context):
+        return hashlib.blake2b(context.encode(), digest_size=8).hexdigest() if context else ''
+
+@st.cache_resource
+def get_answer_cache():
+    # Cached resource -> answers are shared by every session in this server process
+    return AnswerCache()
@@ -0,0 +1,66 @@
+"""Calibration check for the chat answer cache's near-duplicate matching.
+
+    python -m benchmarks.answer_cache
+
+Each pair is cached with the first question and looked up with the second, each with the
+pot context ChatPage would attach to it (PotSummarizer.question_context). SAME pairs
+should be answered from the cache; DIFFERENT pairs must not be, since that would serve
+the wrong answer. Exits 1 on any wrong hit (and reports missed SAME pairs), so run it
+after changing the embedding, the threshold, the word lists or the own-pot heuristic.
+"""
+import sys
+from answer_cache import AnswerCache, embed
+from pot_summary import PotSummarizer
+from sensor_history import SensorHistory
+
+POT_IDS = [1]
+
+SAME = (
+    ('Berapa pH tanah yang ideal untuk tanaman cabai?', 'berapa ph tanah yang ideal untuk tanaman cabai'),
+    ('Kenapa daun tanaman saya menguning?', 'kenapa daun tanaman menguning ya?'),
+    ('Kapan saya harus menyiram tanaman?', 'Kapan harus menyiram tanaman sih'),
+    # Synonyms, affixes and word order
+    ('kenapa daun kuning', 'daun saya kok menguning'),
+    ('Mengapa cabai tidak berbunga?', 'cabai kok gak berbunga'),
+    ('Kapan cabai harus disiram?', 'kapan harus menyiram cabai'),
+    # Spelling variants, found through the vector index
+    ('Berapa kelembapan tanah yang baik untuk cabai?', 'berapa kelembaban tanah yang baik untuk cabai'),
+    # About the user's pots: both get the same pot context
+    ('Apakah kelembapan pot saya sudah cukup?', 'apakah kelembapan pot saya sudah cukup ya'),
+)
+
+DIFFERENT = (
+    # Same spelling except the key word: n-gram similarity alone scored these above the threshold
+    ('Berapa pH tanah yang ideal untuk tanaman cabai?', 'Berapa pH tanah yang ideal untuk tanaman tomat?'),
+    ('Apakah tanaman cabai perlu disiram setiap hari?', 'Apakah tanaman cabai tidak perlu disiram setiap hari?'),
+    ('Apakah tanaman cabai perlu disiram setiap hari?', 'Apakah tanaman cabai gak perlu disiram setiap hari?'),
+    ('Pupuk apa yang cocok untuk tomat?', 'Pupuk apa yang cocok untuk terong?'),
+    ('Apakah kompos bagus untuk cabai?', 'Apakah kompas bagus untuk cabai?'),
+    ('Kapan menyiram tanaman di pagi hari?', 'Kapan menyiram tanaman di sore hari?'),
+)
+
+class OneHistoryStore:
+    """Stands in for SensorHistoryStore: every pot has the same (empty) history."""
+
+    def __init__(self):
+        self.history = SensorHistory(POT_IDS[0])
+
+    def get(self, pot_id):
+        return self.history
+
+def main():
+    summarizer = PotSummarizer(OneHistoryStore())
+    failures = 0
+    for expected, pairs in (('hit', SAME), ('miss', DIFFERENT)):
+        for cached, asked in pairs:
+            cache = AnswerCache()
+            cache.put(cached, 'answer', summarizer.question_context(cached, POT_IDS))
+            result = 'hit' if cache.get(asked, summarizer.question_context(asked, POT_IDS)) is not None else 'miss'
+            similarity = float(embed(cached) @ embed(asked))
+            status = 'ok' if result == expected else ('WRONG ANSWER' if result == 'hit' else 'missed')
+            failures += status == 'WRONG ANSWER'
+            print(f'{status:<13}{similarity:>6.3f}  {cached!r} -> {asked!r}')
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Compare detector backends on a folder of sample pot images.
+
+    python -m benchmarks.backends --images samples/ --backends pytorch onnx openvino --int8
+
+Latency is measured per image after the registry's warm-up. Accuracy is reported against
+the PyTorch backend: boxes are matched per class at IoU >= 0.5, giving precision/recall
+of each backend relative to the reference and the mean IoU of matched boxes.
+"""
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from model_registry import ModelRegistry
+
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png')
+
+def load_images(folder):
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(folder, pattern)))
+    return [(os.path.basename(p), cv2.imread(p)) for p in paths]
+
+def box_iou(a, b):
+    """IoU matrix between xyxy boxes a (N, 4) and b (M, 4)."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+def match(reference, candidate, threshold=0.5):
+    """Greedy per-class matching. Returns (matched IoUs, reference count, candidate count)."""
+    ious = []
+    for cls in np.union1d(reference['cls'], candidate['cls']):
+        ref_boxes = reference['xyxy'][reference['cls'] == cls]
+        cand_boxes = candidate['xyxy'][candidate['cls'] == cls]
+        if not len(ref_boxes) or not len(cand_boxes):
+            continue
+        matrix = box_iou(ref_boxes, cand_boxes)
+        while matrix.size and matrix.max() >= threshold:
+            i, j = np.unravel_index(matrix.argmax(), matrix.shape)
+            ious.append(matrix[i, j])
+            matrix[i, :] = -1
+            matrix[:, j] = -1
+    return ious, len(reference['cls']), len(candidate['cls'])
+
+def run_backend(registry, model_file, images, conf):
+    detections, latencies = [], []
+    for _, image in images:
+        start = time.perf_counter()
+        result = registry.predict(model_file, image, conf=conf)[0]
+        latencies.append(time.perf_counter() - start)
+        detections.append({
+            'xyxy': result.boxes.xyxy.cpu().numpy(),
+            'cls': result.boxes.cls.cpu().numpy().astype(int),
+        })
+    return detections, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weights', default='best.pt')
+    parser.add_argument('--images', required=True, help='Folder of sample pot images')
+    parser.add_argument('--backends', nargs='+', default=['pytorch', 'onnx', 'openvino'])
+    parser.add_argument('--int8', action='store_true', help='Quantize the OpenVINO export to INT8')
+    parser.add_argument('--conf', type=float, default=0.5)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        parser.error(f'No images found in {args.images}')
+
+    registry = ModelRegistry()
+    backends = ['pytorch'] + [b for b in args.backends if b != 'pytorch'] # PyTorch is the reference
+    reference = None
+    print(f"{'backend':<12}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'precision':>11}{'recall':>8}{'mean IoU':>10}")
+    for backend in backends:
+        model_file = registry.resolve(args.weights, backend=backend, int8=args.int8)
+        registry.get(model_file)
+        detections, latencies = run_backend(registry, model_file, images, args.conf)
+        load_time = registry.stats()[model_file]['load_time_s']
+        p50, p95 = np.percentile(latencies * 1000, [50, 95])
+
+        if reference is None:
+            reference = detections
+            precision = recall = mean_iou = 1.0
+        else:
+            matched, ref_count, cand_count = [], 0, 0
+            for ref, cand in zip(reference, detections):
+                ious, n_ref, n_cand = match(ref, cand)
+                matched += ious
+                ref_count += n_ref
+                cand_count += n_cand
+            precision = len(matched) / cand_count if cand_count else 1.0
+            recall = len(matched) / ref_count if ref_count else 1.0
+            mean_iou = float(np.mean(matched)) if matched else 0.0
+
+        print(f"{backend:<12}{load_time:>8.2f}{p50:>9.1f}{p95:>9.1f}{precision:>11.3f}{recall:>8.3f}{mean_iou:>10.3f}")
+
+if __name__ == '__main__':
+    main()
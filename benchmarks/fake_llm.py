@@ -0,0 +1,46 @@
+"""Offline stand-in for the Gemini chain, for benchmarking the chat path without an API key."""
+import asyncio
+import time
+
+ANSWER = ('Untuk tanaman dalam pot, jaga pH tanah di kisaran 6 sampai 7 dan siram ketika '
+          'kelembapan turun di bawah 40 persen. Pastikan pot memiliki lubang drainase, beri '
+          'pupuk seimbang setiap dua minggu, dan letakkan di tempat dengan cahaya tidak langsung.')
+
+class FakeChunk:
+    """Mimics a LangChain AIMessageChunk: `content`, plus `usage_metadata` on the last chunk."""
+
+    def __init__(self, content, usage_metadata=None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+class FakeStreamingChain:
+    """Streams a canned answer word by word with a configurable time-to-first-token and token rate.
+
+    Drop-in for `ModelGenai.chain` wherever only `stream`/`astream` are used (e.g. LlmDispatcher).
+    `rate_limit_every=N` fails every Nth call with a 429-style error before any chunk is sent.
+    """
+
+    def __init__(self, ttft=0.4, tokens_per_second=60.0, answer=ANSWER, rate_limit_every=0):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.answer = answer
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+
+    async def astream(self, inputs):
+        self.calls += 1
+        if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+            raise RuntimeError('429 Resource has been exhausted (e.g. check quota).')
+        await asyncio.sleep(self.ttft)
+        words = self.answer.split(' ')
+        for i, word in enumerate(words):
+            usage = {'output_tokens': len(words)} if i == len(words) - 1 else None
+            yield FakeChunk(word if i == 0 else ' ' + word, usage)
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+    def stream(self, inputs):
+        time.sleep(self.ttft)
+        words = self.answer.split(' ')
+        for i, word in enumerate(words):
+            yield FakeChunk(word if i == 0 else ' ' + word)
+            time.sleep(1 / self.tokens_per_second)
@@ -0,0 +1,356 @@
+"""Simulated concurrent sessions against a local mock of the smart-pot API.
+
+    python -m benchmarks.loadtest --sessions 20 --duration 30 [--history 5000] [--latency-ms 40]
+    python -m benchmarks.loadtest --json > baseline.json
+    python -m benchmarks.loadtest --baseline baseline.json --tolerance 0.25
+
+Each session is a thread, as in the Streamlit server, and goes through the same code
+the pages use: it logs in once through the LoginService, then reruns the Dashboard
+(parallel pot syncs through the shared SensorHistoryStore, latest values, downsampled
+chart frames), looks up and detects its first pot's image (conditional fetch, detection
+cache, reduced decode, inference when --weights can be loaded) and, every
+--chat-every reruns, asks a question through the answer cache and the LlmDispatcher,
+backed by a fake streaming LLM and rendered through the StreamRenderer.
+
+The report lists latency percentiles and throughput per operation and the resident
+memory added per session. Shared resources (API client, caches, model, dispatcher) are
+built once, like the app's cached resources. With --baseline, the run fails (exit 1)
+when an operation's p95 is more than --tolerance slower than in the baseline report.
+The mock server runs in-process unless --base-url points at one started separately
+(python -m benchmarks.mock_server), which keeps it off the load generator's GIL.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+import numpy as np
+from benchmarks.fake_llm import FakeStreamingChain
+from benchmarks.mock_server import MockPotApi, start_server
+from pot_api import PotApiClient
+from login_service import LoginService
+from sensor_history import SensorHistoryStore
+from sensor_db import SensorDatabase
+from dashboard import RESOLUTIONS, TIME_WINDOWS, chart_frame_for
+from detection_cache import DetectionCache, detection_from_result
+from image_io import decode_image
+from answer_cache import AnswerCache
+from pot_summary import PotSummarizer
+from stream_renderer import StreamRenderer
+
+QUESTIONS = (
+    'Berapa pH tanah yang ideal untuk tanaman cabai?',
+    'Berapa ph tanah yang ideal untuk tanaman cabai',
+    'Kapan saya harus menyiram tanaman saya?',
+    'Kenapa daun tanaman saya menguning?',
+    'Pupuk apa yang cocok untuk tomat dalam pot?',
+    'Apakah kelembapan tanah pot saya sudah cukup?',
+)
+
+class Recorder:
+    """Thread-safe latency samples and error counts per operation."""
+
+    def __init__(self):
+        self.__samples = defaultdict(list)
+        self.__errors = defaultdict(int)
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def time(self, operation):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            with self.__lock:
+                self.__errors[operation] += 1
+            logging.debug(f'{operation} failed: {e}')
+            raise
+        self.record(operation, time.perf_counter() - start)
+
+    def record(self, operation, seconds):
+        with self.__lock:
+            self.__samples[operation].append(seconds)
+
+    def report(self, duration):
+        report = {}
+        with self.__lock:
+            operations = sorted(set(self.__samples) | set(self.__errors))
+            for operation in operations:
+                samples = np.array(self.__samples.get(operation, []), dtype=float) * 1000
+                entry = {'count': len(samples), 'errors': self.__errors.get(operation, 0),
+                         'ops_per_s': len(samples) / duration if duration else 0.0}
+                if len(samples):
+                    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+                    entry.update(p50_ms=p50, p95_ms=p95, p99_ms=p99, max_ms=samples.max())
+                report[operation] = entry
+        return report
+
+class NullContainer:
+    """Stands in for st.empty(): the renderer's bookkeeping is measured, not the browser."""
+
+    def markdown(self, text):
+        pass
+
+def rss_bytes():
+    """Current resident set size (Linux), or the peak where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class Harness:
+    """Process-wide resources, shared by all simulated sessions like the app's cached resources."""
+
+    def __init__(self, base_url, args):
+        self.args = args
+        self.client = PotApiClient(base_url)
+        self.login = LoginService(self.client)
+        db = SensorDatabase(args.sensor_db) if args.sensor_db else None
+        self.store = SensorHistoryStore(self.client, ttl=args.store_ttl, db=db)
+        self.detection_cache = DetectionCache(disk_dir=None)
+        self.answer_cache = AnswerCache()
+        self.summarizer = PotSummarizer(self.store)
+        self.registry, self.model_file, self.input_size, self.model_version = self.__load_model(args.weights)
+        self.dispatcher, self.chat_error = self.__start_dispatcher(args)
+
+    @staticmethod
+    def __load_model(weights):
+        if not weights or not os.path.exists(weights):
+            return None, None, 640, 'none'
+        try:
+            from model_registry import ModelRegistry
+        except ImportError as e:
+            logging.warning(f'Inference disabled, model registry unavailable: {e}')
+            return None, None, 640, 'none'
+        registry = ModelRegistry()
+        model_file = registry.resolve(weights)
+        registry.get(model_file)
+        return registry, model_file, registry.input_size(model_file), registry.model_version(model_file)
+
+    @staticmethod
+    def __start_dispatcher(args):
+        try:
+            from llm_dispatcher import LlmDispatcher
+        except ImportError as e:
+            return None, str(e)
+        chain = FakeStreamingChain(ttft=args.llm_ttft_ms / 1000, tokens_per_second=args.llm_tokens_per_s)
+        return LlmDispatcher(chain, requests_per_minute=args.llm_rpm, base_backoff=0.2), None
+
+class Session:
+    """One simulated browser session; holds what the app would keep in its session_state."""
+
+    def __init__(self, index, harness, recorder):
+        self.index = index
+        self.harness = harness
+        self.recorder = recorder
+        self.random = random.Random(index)
+        self.pot_ids = []
+        self.last_image = None
+        self.reruns = 0
+
+    def run(self, stop_at):
+        args = self.harness.args
+        with self.recorder.time('login.lookup'):
+            self.pot_ids = self.harness.login.lookup(1000 + self.index)
+        while time.monotonic() < stop_at:
+            for step in (self.dashboard, self.detection, self.chat):
+                try:
+                    step()
+                except Exception:
+                    pass # Counted by the recorder; the session keeps going like a rerun would
+            self.reruns += 1
+            time.sleep(args.think_ms / 1000 * (0.5 + self.random.random()))
+
+    def dashboard(self):
+        client, store = self.harness.client, self.harness.store
+        window = self.random.choice(list(TIME_WINDOWS.values()))
+        bucket = self.random.choice(list(RESOLUTIONS.values()))
+        with self.recorder.time('dashboard.rerun'):
+            submitted = time.perf_counter()
+            futures = client.submit_many(self.pot_ids, store.get)
+            for pot_id, future in client.as_completed(futures):
+                self.recorder.record('dashboard.pot_sync', time.perf_counter() - submitted)
+                history = future.result()
+                with self.recorder.time('dashboard.chart_build'):
+                    history.latest(2)
+                    chart_frame_for(history, window, bucket)
+
+    def detection(self):
+        harness = self.harness
+        url = harness.client.image_url(self.pot_ids[0])
+        with self.recorder.time('detection.total'):
+            with self.recorder.time('detection.fetch'):
+                key, detection, content = self.__lookup(url)
+            if detection is None:
+                with self.recorder.time('detection.decode'):
+                    frame = decode_image(content, harness.input_size)
+                if harness.registry is not None:
+                    with self.recorder.time('detection.inference'):
+                        result = harness.registry.predict(harness.model_file, frame, conf=0.5)[0]
+                    detection = detection_from_result(result)
+                else:
+                    # No model: cache the decoded frame so the cache path behaves as in the app
+                    detection = {'xyxy': np.empty((0, 4)), 'cls': np.empty(0, dtype=int), 'conf': np.empty(0),
+                                 'names': [], 'frame': frame}
+                if not harness.args.cold_detection:
+                    harness.detection_cache.put(key, detection)
+            self.last_image = detection['frame']
+
+    def __lookup(self, url):
+        harness = self.harness
+        if harness.args.cold_detection:
+            response, _ = harness.client.conditional_get(url)
+            return None, None, response.content
+        # The same lookup as DetectionPage
+        return harness.detection_cache.lookup(harness.client, url, harness.model_version, 0.5)
+
+    def chat(self):
+        harness = self.harness
+        if harness.dispatcher is None or self.reruns % harness.args.chat_every:
+            return
+        question = self.random.choice(QUESTIONS)
+        with self.recorder.time('chat.total'):
+            started = time.perf_counter()
+            with self.recorder.time('chat.context'):
+                pot_context = harness.summarizer.question_context(question, self.pot_ids)
+            answer = harness.answer_cache.get(question, pot_context)
+            if answer is not None:
+                self.recorder.record('chat.cache_hit', time.perf_counter() - started)
+                return
+            stream = harness.dispatcher.stream({'input': question, 'pot_context': pot_context or '-'})
+            renderer = StreamRenderer(NullContainer())
+            first_token_at = None
+            for chunk in stream:
+                content = getattr(chunk, 'content', str(chunk))
+                if content and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    self.recorder.record('chat.ttft', first_token_at - started)
+                renderer.write(content)
+            output = renderer.finalize()
+            self.recorder.record('chat.queue_wait', stream.wait_time)
+            self.recorder.record('chat.render', renderer.stats()['render_time_s'])
+            harness.answer_cache.put(question, output, pot_context)
+
+def run(args, base_url):
+    recorder = Recorder()
+    harness = Harness(base_url, args)
+    baseline_rss = rss_bytes()
+    peak_rss = baseline_rss
+
+    sessions = [Session(i, harness, recorder) for i in range(args.sessions)]
+    started = time.monotonic()
+    stop_at = started + args.duration
+    threads = []
+    for i, session in enumerate(sessions):
+        thread = threading.Thread(target=session.run, args=(stop_at,), name=f'session-{i}', daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp_up / max(args.sessions, 1))
+    while any(thread.is_alive() for thread in threads):
+        peak_rss = max(peak_rss, rss_bytes())
+        time.sleep(0.2)
+    duration = time.monotonic() - started
+
+    reruns = sum(session.reruns for session in sessions)
+    return {
+        'config': {'sessions': args.sessions, 'duration_s': duration, 'history': args.history,
+                   'pots_per_user': args.pots_per_user, 'latency_ms': args.latency_ms,
+                   'inference': harness.registry is not None, 'chat': harness.dispatcher is not None},
+        'throughput': {'reruns': reruns, 'reruns_per_s': reruns / duration},
+        'memory': {'baseline_rss_mb': baseline_rss / 1e6, 'peak_rss_mb': peak_rss / 1e6,
+                   'per_session_mb': (peak_rss - baseline_rss) / 1e6 / max(args.sessions, 1)},
+        'operations': recorder.report(duration),
+        'shared': {'login_cache': harness.login.stats(), 'sensor_store': harness.store.stats(),
+                   'detection_cache': harness.detection_cache.stats(), 'answer_cache': harness.answer_cache.stats(),
+                   'llm_dispatcher': harness.dispatcher.stats() if harness.dispatcher else None},
+        'notes': [note for note in (
+            None if harness.registry else 'inference skipped: pass --weights with an installed ultralytics',
+            f'chat skipped: {harness.chat_error}' if harness.chat_error else None) if note],
+    }
+
+def regressions(report, baseline, tolerance):
+    """Operations whose p95 got more than `tolerance` slower than in `baseline`."""
+    slower = []
+    for operation, entry in report['operations'].items():
+        before = baseline.get('operations', {}).get(operation, {}).get('p95_ms')
+        if before and entry.get('p95_ms') and entry['p95_ms'] > before * (1 + tolerance):
+            slower.append((operation, before, entry['p95_ms']))
+    return slower
+
+def print_report(report):
+    config, memory = report['config'], report['memory']
+    print(f"{config['sessions']} sessions, {config['duration_s']:.1f} s, {config['history']} readings/pot, "
+          f"{config['pots_per_user']} pots/user, {config['latency_ms']:.0f} ms API latency")
+    print(f"{report['throughput']['reruns']} reruns ({report['throughput']['reruns_per_s']:.1f}/s) · "
+          f"RSS {memory['baseline_rss_mb']:.0f} -> {memory['peak_rss_mb']:.0f} MB "
+          f"({memory['per_session_mb']:.2f} MB/session)")
+    print(f"{'operation':<24}{'count':>7}{'errors':>7}{'ops/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for operation, entry in report['operations'].items():
+        if not entry['count']:
+            print(f"{operation:<24}{0:>7}{entry['errors']:>7}")
+            continue
+        print(f"{operation:<24}{entry['count']:>7}{entry['errors']:>7}{entry['ops_per_s']:>8.1f}"
+              f"{entry['p50_ms']:>9.1f}{entry['p95_ms']:>9.1f}{entry['p99_ms']:>9.1f}{entry['max_ms']:>9.1f}")
+    for note in report['notes']:
+        print(f'note: {note}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run after the first session starts')
+    parser.add_argument('--ramp-up', type=float, default=2.0, help='Seconds over which sessions are started')
+    parser.add_argument('--think-ms', type=float, default=500.0, help='Mean pause between a session\'s reruns')
+    parser.add_argument('--base-url', help='Use a running API (e.g. benchmarks.mock_server) instead of an in-process mock')
+    parser.add_argument('--history', type=int, default=2000, help='Readings per pot in the in-process mock')
+    parser.add_argument('--pots-per-user', type=int, default=4)
+    parser.add_argument('--reading-interval', type=float, default=5.0, help='Seconds between new mock readings')
+    parser.add_argument('--latency-ms', type=float, default=40.0, help='Delay the in-process mock adds per request')
+    parser.add_argument('--store-ttl', type=float, default=5.0, help='SensorHistoryStore sync TTL')
+    parser.add_argument('--sensor-db', help='Back the histories with a SensorDatabase at this path')
+    parser.add_argument('--weights', default='best.pt', help='YOLO weights; inference is skipped if missing')
+    parser.add_argument('--cold-detection', action='store_true', help='Bypass the detection cache on every rerun')
+    parser.add_argument('--chat-every', type=int, default=5, help='Ask a question every N reruns per session')
+    parser.add_argument('--llm-ttft-ms', type=float, default=400.0)
+    parser.add_argument('--llm-tokens-per-s', type=float, default=60.0)
+    parser.add_argument('--llm-rpm', type=float, default=600.0, help='Dispatcher rate limit for the fake LLM')
+    parser.add_argument('--json', action='store_true', help='Print a machine-readable report')
+    parser.add_argument('--baseline', help='Report from an earlier --json run to compare p95 latencies against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 slowdown against --baseline')
+    args = parser.parse_args()
+    # Importing the pages turns on INFO logging; per-request log lines would swamp the report
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        api = MockPotApi(args.history, args.pots_per_user, args.reading_interval)
+        server, base_url = start_server(api, latency=args.latency_ms / 1000)
+    try:
+        report = run(args, base_url)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=float))
+    else:
+        print_report(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(report, json.load(f), args.tolerance)
+        for operation, before, after in slower:
+            print(f'REGRESSION {operation}: p95 {before:.1f} -> {after:.1f} ms', file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Local stand-in for the smart-pot API, for benchmarks and offline development.
+
+    python -m benchmarks.mock_server [--port 8765] [--history 2000] [--latency-ms 40]
+    SMART_POT_API_URL=http://127.0.0.1:8765 streamlit run main.py
+
+Serves the three endpoints the app uses:
+
+    /find/user/<chat_id>     pot ids of the user (`--pots-per-user` of them)
+    /find/data/<pot_id>      readings with epoch timestamps; honours ?since=, ETag and 304
+    /get/image/<pot_id>      a synthetic JPEG per pot; honours ETag and 304
+
+Every pot starts with `--history` readings and gains one every `--reading-interval`
+seconds while the server runs, so incremental syncs see new data. `--latency-ms`
+adds a fixed delay per request to stand in for the round trip to the hosted API.
+"""
+import argparse
+import hashlib
+import json
+import math
+import threading
+import time
+import zlib
+import cv2
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class MockPotApi:
+    """Deterministic fake data behind the mock server's endpoints."""
+
+    def __init__(self, history=2000, pots_per_user=4, reading_interval=60.0, image_size=(1280, 720), jpeg_quality=85):
+        self.history = history
+        self.pots_per_user = pots_per_user
+        self.reading_interval = reading_interval
+        self.image_size = image_size
+        self.jpeg_quality = jpeg_quality
+        self.started_at = int(time.time()) # Whole seconds, so ?since= echoes timestamps exactly
+        self.__images = {} # pot_id -> (etag, JPEG bytes), generated on first request
+        self.__lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0}
+
+    def user(self, chat_id):
+        # Users own consecutive pots, so sessions with different chat ids overlap partially
+        first = zlib.crc32(str(chat_id).encode()) % 97 + 1
+        return {'pot_ids': list(range(first, first + self.pots_per_user))}
+
+    def readings_count(self):
+        return self.history + int((time.time() - self.started_at) // self.reading_interval)
+
+    def readings(self, pot_id, since=None):
+        """(ETag, records newer than `since`) for one pot."""
+        count = self.readings_count()
+        # Readings are evenly spaced and end at the newest one; only the requested tail is built
+        newest = self.started_at + (count - self.history) * self.reading_interval
+        first_timestamp = newest - (count - 1) * self.reading_interval
+        start = 0
+        if since is not None:
+            start = max(int(math.floor((float(since) - first_timestamp) / self.reading_interval)) + 1, 0)
+        indices = np.arange(start, count)
+        timestamps = first_timestamp + indices * self.reading_interval
+        # Slow daily cycle plus per-pot phase so every pot's chart looks different
+        phase = timestamps / 86400 * 2 * np.pi + int(pot_id) * 0.7
+        ph = np.round(6.5 + 0.6 * np.sin(phase), 2)
+        soil = np.round(45 + 20 * np.sin(phase / 3) + 5 * np.cos(phase * 5), 1)
+        records = [{'ph': float(p), 'soil': float(s), 'timestamp': int(t)} for p, s, t in zip(ph, soil, timestamps)]
+        return f'"{pot_id}-{count}-{start}"', records
+
+    def image(self, pot_id):
+        with self.__lock:
+            if pot_id not in self.__images:
+                content = self.__render_image(pot_id)
+                self.__images[pot_id] = (f'"{hashlib.blake2b(content, digest_size=8).hexdigest()}"', content)
+            return self.__images[pot_id]
+
+    def __render_image(self, pot_id):
+        width, height = self.image_size
+        rng = np.random.default_rng(zlib.crc32(str(pot_id).encode()))
+        # Gradient, shapes and mild noise: compresses like a camera photo, not like a flat test card
+        gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None]
+        image = np.broadcast_to(gradient, (height, width, 3)).copy()
+        image += rng.normal(0, 6, image.shape).astype(np.float32)
+        image = np.clip(image, 0, 255).astype(np.uint8)
+        for _ in range(6):
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            cv2.circle(image, center, int(rng.integers(height // 20, height // 5)), color, -1)
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return buffer.tobytes()
+
+def make_handler(api, latency=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # Keep-alive, like the hosted API, so pooled connections are reused
+
+        def do_GET(self):
+            api.stats['requests'] += 1
+            if latency:
+                time.sleep(latency)
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            if parts[:2] == ['find', 'user'] and len(parts) == 3:
+                self.__send(json.dumps(api.user(parts[2])).encode(), 'application/json')
+            elif parts[:2] == ['find', 'data'] and len(parts) == 3:
+                since = parse_qs(url.query).get('since', [None])[0]
+                etag, records = api.readings(parts[2], since)
+                self.__send(json.dumps(records).encode(), 'application/json', etag)
+            elif parts[:2] == ['get', 'image'] and len(parts) == 3:
+                etag, content = api.image(parts[2])
+                self.__send(content, 'image/jpeg', etag)
+            else:
+                self.__send(b'{"error": "not found"}', 'application/json', status=404)
+
+        def __send(self, body, content_type, etag=None, status=200):
+            if etag and self.headers.get('If-None-Match') == etag:
+                api.stats['not_modified'] += 1
+                status, body = 304, b''
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # One line per request would dominate the benchmark's own output
+
+    return Handler
+
+def start_server(api=None, host='127.0.0.1', port=0, latency=0.0):
+    """Serves `api` from a background thread. Returns (server, base_url); call server.shutdown() when done."""
+    api = api or MockPotApi()
+    server = ThreadingHTTPServer((host, port), make_handler(api, latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='mock-pot-api', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--history', type=int, default=2000, help='Readings per pot at startup')
+    parser.add_argument('--pots-per-user', type=int, default=4)
+    parser.add_argument('--reading-interval', type=float, default=60.0, help='Seconds between readings')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every response')
+    parser.add_argument('--image-size', type=int, nargs=2, default=(1280, 720), metavar=('WIDTH', 'HEIGHT'))
+    args = parser.parse_args()
+
+    api = MockPotApi(args.history, args.pots_per_user, args.reading_interval, tuple(args.image_size))
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(api, args.latency_ms / 1000))
+    server.daemon_threads = True
+    print(f'Mock smart-pot API on http://{args.host}:{args.port} (Ctrl+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Import-time profile of the app's entry point and page modules.
+
+    python -m benchmarks.startup [--top 10] [--json]
+
+Each module is imported in a fresh interpreter with `-X importtime`, so the numbers
+are cold-start costs and don't depend on import order. Run it before and after a
+change to catch startup regressions (e.g. a heavy import creeping into main.py).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODULES = ('main', 'login', 'dashboard', 'detection', 'chat')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_profile(module):
+    """{package: cumulative microseconds} for a cold `import module`."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{result.stderr.splitlines()[-1]}')
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        # Nested imports are indented; the outermost entry per package is the one that counts
+        profile[name] = max(profile.get(name, 0), int(cumulative))
+    return profile
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=10, help='Heaviest top-level packages to list per module')
+    parser.add_argument('--json', action='store_true', help='Print a machine-readable report')
+    args = parser.parse_args()
+
+    report = {}
+    for module in MODULES:
+        try:
+            profile = import_profile(module)
+        except RuntimeError as e:
+            report[module] = {'error': str(e)}
+            continue
+        top_level = {name: us for name, us in profile.items() if '.' not in name and name != module}
+        heaviest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        report[module] = {'total_ms': profile.get(module, 0) / 1000,
+                          'heaviest_ms': {name: us / 1000 for name, us in heaviest}}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for module, info in report.items():
+        if 'error' in info:
+            print(f'{module:<12} ERROR {info["error"]}')
+            continue
+        print(f'{module:<12} {info["total_ms"]:>9.1f} ms')
+        for name, ms in info['heaviest_ms'].items():
+            print(f'    {name:<28} {ms:>9.1f} ms')
+
+if __name__ == '__main__':
+    main()
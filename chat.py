@@ -1,9 +1,18 @@
 import streamlit as st
-from model_genai import ModelGenai
+import time
+import logging
+from llm_dispatcher import get_llm_dispatcher, RateLimitError
+from answer_cache import get_answer_cache
+from stream_renderer import StreamRenderer
+from pot_summary import get_pot_summarizer
+from metrics import metrics
 
 class ChatPage:
     def __init__(self):
-        self.__model = ModelGenai()
+        # Calls go through the shared queue/rate limiter instead of hitting Gemini directly
+        self.__dispatcher = get_llm_dispatcher(st.secrets['GOOGLE_API_KEY'])
+        self.__answer_cache = get_answer_cache()
+        self.__summarizer = get_pot_summarizer()
         if 'last_message' not in st.session_state:
             st.session_state['last_message'] = None
 
@@ -12,6 +21,7 @@ class ChatPage:
         st.markdown('Tanyakan apa saja tentang tanaman. Aku tidak bisa mengingat pertanyaan sebelumnya.')
 
         question = st.text_input('Pertanyaan Anda:')
+        st.toggle('Gunakan data pot saya 🪴', value=True, key='chat_use_pot_context')
 
         if st.button('Tanya') and question.strip():
             self.__handle_question(question)
@@ -24,17 +34,76 @@ class ChatPage:
     def __handle_question(self, question):
         with st.spinner('Menjawab...'):
             try:
-                answer_stream = self.__model.chain.stream({'input': question})
-                response_container = st.empty()
-                output = ''
+                started = time.perf_counter()
+                pot_context = self.__pot_context(question)
+                # Same or near-duplicate questions (with the same pot data, if any) are answered from the cache
+                cached_answer = self.__answer_cache.get(question, pot_context)
+                if cached_answer is not None:
+                    answer_stream = self.__cached_stream(cached_answer)
+                else:
+                    answer_stream = self.__dispatcher.stream({'input': question, 'pot_context': pot_context or '-'})
+                # Buffered renderer: re-renders at a bounded rate instead of once per chunk
+                renderer = StreamRenderer(st.empty())
+                first_token_at = None
+                output_tokens = None
 
                 for chunk in answer_stream:
                     content = getattr(chunk, 'content', str(chunk))
-                    output += content
-                    response_container.markdown(output + '▌')
+                    if content and first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    usage = getattr(chunk, 'usage_metadata', None)
+                    if usage and usage.get('output_tokens'):
+                        output_tokens = usage['output_tokens'] # Reported by Gemini, usually on the last chunk
+                    renderer.write(content)
 
-                response_container.markdown(output)
-                st.success('✅ Jawaban diberikan.')
+                output = renderer.finalize()
+                source = 'llm' if cached_answer is None else 'cache'
+                if first_token_at is not None:
+                    metrics.observe('llm_ttft_seconds', first_token_at - started, source=source)
+                metrics.observe('llm_answer_seconds', time.perf_counter() - started, source=source)
+                if cached_answer is None:
+                    if output.strip():
+                        self.__answer_cache.put(question, output, pot_context)
+                    st.success('✅ Jawaban diberikan.')
+                else:
+                    st.success('✅ Jawaban diberikan (dari cache).')
+                self.__show_timing(started, first_token_at, time.perf_counter(), output_tokens, output, renderer.stats())
+                wait_time = getattr(answer_stream, 'wait_time', 0)
+                if wait_time > 0.5:
+                    st.caption(f'Menunggu antrean: {wait_time:.1f} dtk')
                 st.session_state['last_message'] = {'question': question, 'answer': output}
+            except RateLimitError:
+                st.error('❌ Kuota API habis. Silakan coba lagi beberapa saat lagi.')
             except Exception as e:
                 st.error('❌ Terjadi kesalahan. Mungkin kuota API habis.')
+
+    def __show_timing(self, started, first_token_at, finished, output_tokens, output, render_stats):
+        if first_token_at is None:
+            return
+        # Without usage metadata, ~4 characters per token is a fair estimate
+        tokens = output_tokens or max(len(output) // 4, 1)
+        generation_time = finished - first_token_at
+        rate = f'{tokens / generation_time:.0f} token/dtk' if generation_time > 0 else '-'
+        st.caption(f'Token pertama: {first_token_at - started:.2f} dtk · {rate} · '
+                   f"{render_stats['chunks']} chunk, {render_stats['flushes']} render "
+                   f"({render_stats['render_time_s'] * 1000:.0f} ms)")
+
+    def __pot_context(self, question):
+        # Pot data changes with every reading and is part of the cache key, so general
+        # questions go without it and their answers stay shared across users
+        if not st.session_state.get('chat_use_pot_context', True):
+            return ''
+        try:
+            return self.__summarizer.question_context(question, st.session_state.get('pot_ids', []))
+        except Exception as e:
+            # Answer without pot data rather than not at all
+            logging.warning(f'Could not build pot context for chat: {e}')
+            return ''
+
+    @staticmethod
+    def __cached_stream(answer):
+        # Word-sized chunks so a cached answer renders through the same streaming path
+        words = answer.split(' ')
+        yield words[0]
+        for word in words[1:]:
+            yield ' ' + word
@@ -1,19 +1,84 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import requests
+import os
 import time
 import logging # Add logging
+from pot_api import get_pot_api_client
+from sensor_history import get_sensor_store
+from metrics import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Range of the per-pot refresh inputs; configured intervals are clamped into it
+MIN_REFRESH_INTERVAL = 2.0
+MAX_REFRESH_INTERVAL = 24 * 60 * 60.0
+
+def clamp_refresh_interval(seconds):
+    return min(max(float(seconds), MIN_REFRESH_INTERVAL), MAX_REFRESH_INTERVAL)
+
+DEFAULT_REFRESH_INTERVAL = clamp_refresh_interval(os.environ.get('DASHBOARD_REFRESH_SECONDS', 10)) # Refresh every 10 seconds
+
+def parse_refresh_intervals(text):
+    """'3=30,7=120' -> {'3': 30.0, '7': 120.0}; pot ids are kept as strings, seconds are clamped."""
+    intervals = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        pot_id, _, seconds = item.partition('=')
+        try:
+            seconds = float(seconds)
+        except ValueError:
+            logging.warning(f"Ignoring invalid refresh interval {item!r} in DASHBOARD_POT_REFRESH_SECONDS")
+            continue
+        intervals[pot_id.strip()] = clamp_refresh_interval(seconds)
+        if intervals[pot_id.strip()] != seconds:
+            logging.warning(f"Refresh interval {item!r} clamped to {intervals[pot_id.strip()]:g} seconds")
+    return intervals
+
+# Per-pot refresh intervals, e.g. DASHBOARD_POT_REFRESH_SECONDS="3=30,7=120" for slow-changing pots
+POT_REFRESH_INTERVALS = parse_refresh_intervals(os.environ.get('DASHBOARD_POT_REFRESH_SECONDS', ''))
+CHART_MAX_POINTS = 400 # Roughly the pixel width of a tile; more points are invisible anyway
+
+# Selectable chart windows, in seconds back from the newest reading
+TIME_WINDOWS = {
+    'All': None,
+    'Last hour': 60 * 60,
+    'Last 24 hours': 24 * 60 * 60,
+    'Last 7 days': 7 * 24 * 60 * 60,
+    'Last 30 days': 30 * 24 * 60 * 60,
+}
+
+# Chart resolutions: downsampled raw readings, or min/max/mean per bucket
+RESOLUTIONS = {
+    'Raw': None,
+    'Hourly': 60 * 60,
+    'Daily': 24 * 60 * 60,
+}
+
+def chart_frame_for(history, window, bucket):
+    """What a pot tile plots: per-bucket aggregates, or downsampled raw readings for Raw
+    resolution and readings without timestamps. Both are capped to about CHART_MAX_POINTS
+    and cached by the history."""
+    frame = history.aggregate_frame(bucket, window, CHART_MAX_POINTS) if bucket else None
+    if frame is None:
+        frame = history.chart_frame(window, CHART_MAX_POINTS)
+    return frame
+
 class DashboardPage:
-    def __init__(self, pot_ids=None): # pot_ids argument is no longer strictly needed here
+    def __init__(self, pot_ids=None, refresh_interval=None, pot_refresh_intervals=None): # pot_ids argument is no longer strictly needed here
         self.title = 'Dashboard'
         # self.__pot_ids = pot_ids # Remove storing pot_ids from init
-        self.__base_url = 'https://api-smart-pot-test.vercel.app/find/data/'
+        self.__client = get_pot_api_client()
+        self.__store = get_sensor_store()
         # Initialize placeholders dictionary
         self.__placeholders = {}
+        # Syncs started by the last full run; empty during fragment-only reruns
+        self.__pending = {}
+
+        # Refresh interval in seconds, overridable per pot (e.g. slow-changing pots)
+        self.__refresh_interval = refresh_interval or DEFAULT_REFRESH_INTERVAL
+        pot_refresh_intervals = POT_REFRESH_INTERVALS if pot_refresh_intervals is None else pot_refresh_intervals
+        self.__pot_refresh_intervals = {str(pot_id): seconds for pot_id, seconds in pot_refresh_intervals.items()}
 
         # No need for monitoring_active state anymore
         # if 'monitoring_active' not in st.session_state:
@@ -28,14 +93,18 @@ class DashboardPage:
 
         if not current_pot_ids:
             st.warning("No pots associated with your account.")
-            # Add a small delay and rerun even if no pots, to check again later
-            time.sleep(10)
-            st.rerun()
             return # Don't proceed if there are no pots
 
+        st.selectbox('Chart window', list(TIME_WINDOWS), key='dashboard_window')
+        st.selectbox('Chart resolution', list(RESOLUTIONS), key='dashboard_resolution')
+        self.__show_refresh_controls(current_pot_ids)
+
         # Clear and rebuild placeholders dictionary for the current set of pots
         self.__placeholders = {}
 
+        # Start syncing every pot in parallel before laying out the tiles
+        self.__pending = self.__client.submit_many(current_pot_ids, self.__store.get)
+
         # --- Arrange pots in rows ---
         pots_per_row = 3 # Adjust this number as needed for your layout preference
         num_pots = len(current_pot_ids)
@@ -49,36 +118,60 @@ class DashboardPage:
             # Iterate through the pots and columns for this row
             for j, pot_id in enumerate(row_pot_ids):
                 with cols[j]: # Use the column index 'j' for this row
-                    st.subheader(f"Pot: {pot_id}")
-
-                    # Create nested columns for pH and Soil metrics
-                    metric_cols = st.columns(2)
-                    with metric_cols[0]:
-                        ph_placeholder = st.empty()
-                    with metric_cols[1]:
-                        soil_placeholder = st.empty()
-
-                    # Chart placeholder remains below the metrics
-                    chart_placeholder = st.empty()
-
-                    # Store placeholders in the dictionary
-                    self.__placeholders[pot_id] = {
-                        'ph': ph_placeholder,
-                        'soil': soil_placeholder,
-                        'chart': chart_placeholder
-                    }
-
-                    # Fetch and display data for this pot immediately
-                    self.__fetch_and_display_single_pot(pot_id)
+                    # Each tile is a fragment with its own timer: only the tile reruns on refresh,
+                    # and no script thread is held between ticks
+                    tile = st.fragment(self.__show_pot_tile, run_every=self.__refresh_interval_for(pot_id))
+                    tile(pot_id)
             # Add a horizontal rule between rows for better separation (optional)
             if i + pots_per_row < num_pots:
                  st.divider()
 
-
-        # Add sleep and rerun for automatic refresh (remains at the end)
-        refresh_interval = 10 # Refresh every 10 seconds
-        time.sleep(refresh_interval)
-        st.rerun()
+        # Fill each pot's placeholders as its sync completes, so one slow pot doesn't hold up the rest
+        for pot_id, future in self.__client.as_completed(self.__pending):
+            self.__display_single_pot(pot_id, future)
+        self.__pending = {}
+        logging.debug(f"Sensor cache stats: {self.__store.stats()}")
+
+    def __refresh_interval_for(self, pot_id):
+        # Session-level overrides (set in the 'Refresh intervals' expander) win over the configured ones
+        overrides = st.session_state.get('pot_refresh_intervals', {})
+        seconds = overrides.get(str(pot_id)) or self.__pot_refresh_intervals.get(str(pot_id)) or self.__refresh_interval
+        return clamp_refresh_interval(seconds) # Also the refresh input's value, which must be in its range
+
+    def __show_refresh_controls(self, pot_ids):
+        overrides = st.session_state.setdefault('pot_refresh_intervals', {})
+        with st.expander('Refresh intervals'):
+            cols = st.columns(min(len(pot_ids), 3))
+            for i, pot_id in enumerate(pot_ids):
+                with cols[i % len(cols)]:
+                    overrides[str(pot_id)] = st.number_input(
+                        f'Pot {pot_id} (seconds)', min_value=MIN_REFRESH_INTERVAL, max_value=MAX_REFRESH_INTERVAL, step=5.0,
+                        value=float(self.__refresh_interval_for(pot_id)), key=f'dashboard_refresh_{pot_id}')
+
+    def __show_pot_tile(self, pot_id):
+        st.subheader(f"Pot: {pot_id}")
+
+        # Create nested columns for pH and Soil metrics
+        metric_cols = st.columns(2)
+        with metric_cols[0]:
+            ph_placeholder = st.empty()
+        with metric_cols[1]:
+            soil_placeholder = st.empty()
+
+        # Chart placeholder remains below the metrics
+        chart_placeholder = st.empty()
+
+        # Store placeholders in the dictionary
+        self.__placeholders[pot_id] = {
+            'ph': ph_placeholder,
+            'soil': soil_placeholder,
+            'chart': chart_placeholder
+        }
+
+        # On a full run show() fills the tile once the parallel sync lands;
+        # on a timer tick only this tile reruns and syncs its own pot
+        if pot_id not in self.__pending:
+            self.__display_single_pot(pot_id, self.__client.submit(self.__store.get, pot_id))
 
 
     # Remove the _run_monitoring_loop method entirely
@@ -95,11 +188,9 @@ class DashboardPage:
     #        # Wait before the next fetch cycle for all pots
     #        # time.sleep()
 
-    def __fetch_and_display_single_pot(self, pot_id):
-        # --- This method remains largely the same ---
-        # It fetches data for one pot and updates its placeholders
-        # It now relies on self.__placeholders being correctly populated in show()
-        url = self.__base_url + str(pot_id)
+    def __display_single_pot(self, pot_id, future):
+        # Updates the placeholders of one pot from its (already submitted) sync
+        # It relies on self.__placeholders being correctly populated in show()
         ph_placeholder = None
         soil_placeholder = None
         chart_placeholder = None
@@ -136,65 +227,44 @@ class DashboardPage:
             chart_placeholder.empty()
 
 
-            response = requests.get(url, timeout=10) # Add timeout
-            response.raise_for_status()
-            data = response.json()
-            logging.debug(f"Data received for pot {pot_id}: {data}")
-
-            if data and isinstance(data, list) and len(data) >= 1: # Need at least 1 record for current, 2 for delta
-                last_data = data[-1]
-                ph = last_data.get('ph', 'N/A')
-                soil = last_data.get('soil', 'N/A')
-
-                delta_ph_label = "N/A"
-                delta_soil_label = "N/A"
+            history = future.result() # Re-raises any request error from the worker thread
+            logging.debug(f"{len(history)} reading(s) held for pot {pot_id} (version {history.version})")
 
-                if len(data) >= 2:
-                    delta_data = data[-2]
-                    prev_ph = delta_data.get('ph', 'N/A')
-                    prev_soil = delta_data.get('soil', 'N/A')
+            if len(history) >= 1: # Need at least 1 record for current, 2 for delta
+                latest = history.latest(2)
+                ph = latest['ph'][-1]
+                soil = latest['soil'][-1]
 
-                    if isinstance(ph, (int, float)) and isinstance(prev_ph, (int, float)):
-                        delta_ph = ph - prev_ph
-                        delta_ph_label = f'{delta_ph:+.2f}' # Add sign
-                    else:
-                         delta_ph_label = "N/A" # Indicate calculation wasn't possible
-
-                    if isinstance(soil, (int, float)) and isinstance(prev_soil, (int, float)):
-                        delta_soil = soil - prev_soil
-                        delta_soil_label = f'{delta_soil:+.2f}' # Add sign
-                    else:
-                         delta_soil_label = "N/A" # Indicate calculation wasn't possible
+                # Deltas come straight from the buffer, N/A when either value is missing
+                delta_ph_label = self.__delta_label(latest['ph'])
+                delta_soil_label = self.__delta_label(latest['soil'])
 
                 # Update placeholders for the specific pot
-                ph_placeholder.metric('pH Level 🌱', f'{ph}', delta_ph_label)
-                soil_placeholder.metric('Soil Level 🌍', f'{soil}', delta_soil_label)
-
-                # Prepare DataFrame for charting
-                df = pd.DataFrame(data)
-                # Ensure 'ph' and 'soil' columns exist, handle potential missing data if needed
-                chart_cols = []
-                if 'ph' in df.columns:
-                    df['ph'] = pd.to_numeric(df['ph'], errors='coerce')
-                    chart_cols.append('ph')
-                if 'soil' in df.columns:
-                    df['soil'] = pd.to_numeric(df['soil'], errors='coerce')
-                    chart_cols.append('soil')
-
-                if chart_cols:
-                    # Ensure DataFrame has expected columns before plotting
-                    df_to_plot = df[chart_cols].dropna()
-                    if not df_to_plot.empty:
-                         chart_placeholder.line_chart(df_to_plot)
-                    else:
-                         chart_placeholder.info("No valid chart data points.")
+                ph_placeholder.metric('pH Level 🌱', self.__value_label(ph), delta_ph_label)
+                soil_placeholder.metric('Soil Level 🌍', self.__value_label(soil), delta_soil_label)
+
+                # Downsampled chart (or per-bucket aggregates) from the history, cached until new readings arrive
+                window = TIME_WINDOWS.get(st.session_state.get('dashboard_window'))
+                bucket = RESOLUTIONS.get(st.session_state.get('dashboard_resolution'))
+                df_to_plot = chart_frame_for(history, window, bucket)
+                if not df_to_plot.empty:
+                     with metrics.timer('chart_render_seconds'):
+                         if history.sync_error is not None:
+                             # Served from the local store while the API is unreachable
+                             with chart_placeholder.container():
+                                 st.line_chart(df_to_plot)
+                                 st.caption('⚠️ API unreachable, showing stored readings.')
+                         else:
+                             chart_placeholder.line_chart(df_to_plot)
+                else:
+                     chart_placeholder.info("No valid chart data points.")
 
             else:
                 # Handle cases with no data or unexpected format
                 ph_placeholder.metric('pH Level 🌱', 'N/A', 'N/A')
                 soil_placeholder.metric('Soil Level 🌍', 'N/A', 'N/A')
                 chart_placeholder.info("No data received for this pot.")
-                logging.warning(f"No data or invalid data format for pot {pot_id}: {data}")
+                logging.warning(f"No data held for pot {pot_id}")
 
         except requests.exceptions.Timeout:
              logging.error(f'Timeout error fetching data for pot: {pot_id}')
@@ -220,3 +290,13 @@ class DashboardPage:
                 #     st.error(log_msg) # Avoid global error spam
             except Exception as inner_e:
                  logging.error(f"Error trying to display error message for pot {pot_id}: {inner_e}")
+
+    @staticmethod
+    def __value_label(value):
+        return f'{value:g}' if np.isfinite(value) else 'N/A'
+
+    @staticmethod
+    def __delta_label(values):
+        if len(values) < 2 or not np.all(np.isfinite(values)):
+            return "N/A" # Indicate calculation wasn't possible
+        return f'{values[-1] - values[-2]:+.2f}' # Add sign
@@ -1,69 +1,227 @@
 import streamlit as st
 import cv2
-import requests
-import numpy as np
-import base64
-import streamlit.components.v1 as components
+import io
+import logging
+import zipfile
 from datetime import datetime
-from ultralytics import YOLO
+from model_registry import get_model_registry
+from pot_api import get_pot_api_client
+from detection_stream import DetectionStream
+from image_io import decode_image
+from detection_cache import get_detection_cache, detection_from_result
+from pot_summary import get_pot_summarizer
 
 class DetectionPage:
-    def __init__(self, pot_id):
+    def __init__(self, pot_ids):
         if 'is_streaming' not in st.session_state:
             st.session_state['is_streaming'] = False
         if 'last_image' not in st.session_state:
             st.session_state['last_image'] = None
 
-        self.__model_file = 'best.pt'
-        self.__model = YOLO(self.__model_file)
-        self.__url = 'https://api-smart-pot-test.vercel.app/get/image/' + str(pot_id)
+        self.__registry = get_model_registry()
+        # best.pt, or its ONNX/OpenVINO export when DETECTION_BACKEND selects one
+        self.__model_file = self.__registry.resolve('best.pt')
+        self.__registry.get(self.__model_file) # Load (once per process) before the first click
+        self.__input_size = self.__registry.input_size(self.__model_file)
+        self.__model_version = self.__registry.model_version(self.__model_file)
+        self.__conf = 0.5
+        self.__cache = get_detection_cache()
+        self.__summarizer = get_pot_summarizer() # Latest labels feed the chat's pot context
+        if 'grid_images' not in st.session_state:
+            st.session_state['grid_images'] = {}
+
+        # Main passes the full list of pots; a single id still works
+        self.__pot_ids = list(pot_ids) if isinstance(pot_ids, (list, tuple)) else [pot_ids]
+        self.__client = get_pot_api_client()
+        self.__pot_id = self.__pot_ids[0]
+        self.__url = self.__client.image_url(self.__pot_id)
 
     def show(self):
         st.title('Deteksi Objek 🔍')
+        view = st.radio('Tampilan', ['Satu pot', 'Semua pot'], horizontal=True, key='detection_view')
+        if view == 'Semua pot':
+            self.__show_all_pots()
+            return
+
         st.markdown('Tekan tombol "Ambil Gambar" untuk melakukan deteksi.')
+        self.__pot_id = st.selectbox('Pot', self.__pot_ids, key='detection_pot', on_change=self.__reset_single_pot)
+        self.__url = self.__client.image_url(self.__pot_id)
         col1, col2 = st.columns(2)
 
         with col2:
             self.__control_streaming()
+            self.__show_model_info()
+            self.__show_memory_usage()
 
         with col1:
-            self.__stream_placeholder = st.empty()
-            self.__handle_display()
+            if st.session_state.get('stream_mode'):
+                self.__handle_stream()
+            else:
+                self.__stream_placeholder = st.empty()
+                self.__handle_display()
+
+        with self.__download_slot:
+            self.__download_button()
+        self.__prune_jpeg_cache()
+
+    @staticmethod
+    def __reset_single_pot():
+        # A new pot must not keep showing the previous pot's frame under its name
+        st.session_state['is_streaming'] = False
+        st.session_state['last_image'] = None
+        if st.session_state.get('detection_stream') is not None:
+            st.session_state['detection_stream'].stop()
 
     def __control_streaming(self):
+        st.toggle('Mode streaming 🎥', key='stream_mode')
+        if st.session_state.get('stream_mode'):
+            st.slider('Target FPS', min_value=0.5, max_value=10.0, value=2.0, step=0.5, key='stream_fps')
         if st.button('Ambil Gambar 📸'):
             st.session_state['is_streaming'] = True
             st.session_state['last_image'] = None
-        if st.button('Unduh 💾'):
-            self.__download_button()
+        # Filled after the image is processed, so it always offers the frame shown in this run
+        self.__download_slot = st.empty()
         if st.button('Berhenti 🛑'):
             st.session_state['is_streaming'] = False
             st.session_state['last_image'] = None
+            if st.session_state.get('detection_stream') is not None:
+                st.session_state['detection_stream'].stop()
+
+    def __handle_stream(self):
+        stream = st.session_state.get('detection_stream')
+        if stream is None or stream.url != self.__url:
+            if stream is not None:
+                stream.stop()
+            stream = DetectionStream(self.__url, self.__client, self.__predict, target_size=self.__input_size)
+            st.session_state['detection_stream'] = stream
+        stream.target_fps = st.session_state.get('stream_fps', 2.0)
+
+        if not st.session_state['is_streaming']:
+            stream.stop()
+            st.info('Tekan "Ambil Gambar" untuk memulai streaming.')
+            return
+        stream.start()
+
+        # Only this fragment reruns on each tick; the producer/inference threads do the work
+        st.fragment(self.__show_stream_frame, run_every=1.0 / stream.target_fps)(stream)
+
+    def __show_stream_frame(self, stream):
+        frame = stream.latest()
+        if frame is not None:
+            st.session_state['last_image'] = frame # Keeps "Unduh" working in streaming mode
+            st.image(frame, channels='BGR')
+        elif stream.last_error is not None:
+            st.warning('Kamera sedang tidak aktif 😞.')
+        else:
+            st.info('Menunggu frame pertama...')
+
+        stats = stream.stats()
+        latency = ', '.join(f'{stage} {seconds * 1000:.0f} ms'
+                            for stage, seconds in stats['latency_s'].items() if seconds is not None)
+        fps = f"{stats['fps']:.1f}" if stats['fps'] else '-'
+        st.caption(f"FPS: {fps} / {stream.target_fps:g} · {latency} · {stats['dropped']} frame dilewati")
+
+    def __show_all_pots(self):
+        st.markdown('Tekan tombol "Deteksi Semua Pot" untuk mendeteksi gambar terbaru dari setiap pot.')
+        if st.button('Deteksi Semua Pot 🪴'):
+            st.session_state['grid_images'] = self.__detect_all_pots()
+
+        results = st.session_state['grid_images']
+        if not results:
+            return
+        self.__download_zip_button(results)
+
+        pots_per_row = 3
+        for i in range(0, len(self.__pot_ids), pots_per_row):
+            row_pot_ids = self.__pot_ids[i : i + pots_per_row]
+            cols = st.columns(pots_per_row)
+            for j, pot_id in enumerate(row_pot_ids):
+                with cols[j]:
+                    st.subheader(f'Pot: {pot_id}')
+                    frame = results.get(pot_id)
+                    if frame is not None:
+                        st.image(frame, channels='BGR')
+                    else:
+                        st.warning('Kamera sedang tidak aktif 😞.')
+
+    def __detect_all_pots(self):
+        # Download (or revalidate) every pot's latest image in parallel over the pooled session
+        lookups = {}
+        futures = self.__client.submit_many(self.__pot_ids, lambda pot_id: self.__lookup(self.__client.image_url(pot_id)))
+        for pot_id, future in self.__client.as_completed(futures):
+            try:
+                lookups[pot_id] = future.result()
+            except Exception as e:
+                logging.warning(f'Image fetch failed for pot {pot_id}: {e}')
+
+        detections = {pot_id: detection for pot_id, (_, detection, _) in lookups.items() if detection is not None}
+        frames = {}
+        for pot_id, (key, detection, content) in lookups.items():
+            if detection is None:
+                frame = decode_image(content, self.__input_size)
+                if frame is not None:
+                    frames[pot_id] = frame
+
+        if frames:
+            # One batched call for the pots whose images changed instead of one inference per image
+            pot_ids = list(frames)
+            with st.spinner(f'Mendeteksi {len(pot_ids)} gambar...'):
+                results = self.__predict([frames[pot_id] for pot_id in pot_ids], conf=self.__conf)
+            for pot_id, result in zip(pot_ids, results):
+                detections[pot_id] = detection_from_result(result)
+                self.__cache.put(lookups[pot_id][0], detections[pot_id])
+
+        for pot_id, detection in detections.items():
+            self.__summarizer.record_detection(pot_id, detection['names'])
+
+        return {pot_id: detection['frame'] for pot_id, detection in detections.items()}
+
+    def __lookup(self, url):
+        return self.__cache.lookup(self.__client, url, self.__model_version, self.__conf)
+
+    def __predict(self, frame, **kwargs):
+        return self.__registry.predict(self.__model_file, frame, **kwargs)
+
+    def __show_model_info(self):
+        info = self.__registry.stats().get(self.__model_file)
+        if info:
+            param_mb = (info['param_bytes'] or 0) / 1e6
+            st.caption(f"Model dimuat dalam {info['load_time_s']:.2f} dtk, {param_mb:.1f} MB parameter")
+
+    def __show_memory_usage(self):
+        frames = [st.session_state['last_image'], *st.session_state['grid_images'].values()]
+        frames = [frame for frame in frames if frame is not None]
+        if frames:
+            total_kb = sum(frame.nbytes for frame in frames) / 1e3
+            st.caption(f'Memori gambar sesi: {total_kb:.0f} kB ({len(frames)} frame)')
 
     def __handle_display(self):
         if st.session_state['is_streaming'] and st.session_state['last_image'] is not None:
-            self.__stream_placeholder.image(st.session_state['last_image'], channels='RGB')
+            self.__stream_placeholder.image(st.session_state['last_image'], channels='BGR')
         elif st.session_state['is_streaming']:
             self.__process_url_image(self.__url)
 
     def __process_url_image(self, image_url):
         try:
-            response = requests.get(image_url, stream=True)
-            response.raise_for_status()
+            # Unchanged images (HTTP 304 or same content hash) come straight from the detection cache
+            key, detection, content = self.__lookup(image_url)
 
-            image_bytes = np.asarray(bytearray(response.raw.read()), dtype=np.uint8)
+            if detection is None:
+                # Decode straight from the response bytes (no bytearray/asarray copies), at reduced
+                # resolution when the camera sends JPEGs much larger than the model input
+                frame = decode_image(content, self.__input_size)
+                del content
+                if frame is not None:
+                    # Ultralytics expects BGR frames, so no colour conversion is needed
+                    detection = detection_from_result(self.__predict(frame, conf=self.__conf)[0])
+                    self.__cache.put(key, detection)
 
-            st.session_state['last_image'] = image_bytes
+            if detection is not None:
+                self.__summarizer.record_detection(self.__pot_id, detection['names'])
+                # Only the annotated frame is kept in the session, not the raw bytes
+                st.session_state['last_image'] = detection['frame']
 
-            frame = cv2.imdecode(image_bytes, cv2.IMREAD_COLOR)
-
-            if frame is not None:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = self.__model(frame, verbose=False, conf=0.5)
-                detected_frame = results[0].plot()
-                st.session_state['last_image'] = detected_frame
-
-                self.__stream_placeholder.image(st.session_state['last_image'], channels='RGB')
+                self.__stream_placeholder.image(st.session_state['last_image'], channels='BGR')
             else:
                 st.error('Gagal membaca gambar dari URL 😞.')
                 st.session_state['is_streaming'] = False
@@ -73,23 +231,53 @@ class DetectionPage:
             st.session_state['is_streaming'] = False
 
     def __download_button(self):
-        if st.session_state['last_image'] is not None:
-            rgb_image = cv2.cvtColor(st.session_state['last_image'], cv2.COLOR_RGB2BGR)
-            success, buffer = cv2.imencode('.jpg', rgb_image)
-
-            if success:
-                b64 = base64.b64encode(buffer).decode()
-                filename = f'detected_image_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg'
-                href = f'''
-                        <a href="data:file/jpg;base64,{b64}" download="{filename}" id="download-link"></a>
-
-                        <script>
-                            document.getElementById("download-link").click()
-                        </script>
-                        '''
-                st.success('🎉 Gambar berhasil diunduh!')
-                components.html(href, height=0, width=0)
-            else:
-                st.error('Gagal mengkodekan gambar untuk diunduh.')
-        else:
-            st.warning('Tidak ada gambar yang terdeteksi untuk diunduh.')
+        # Served as raw JPEG bytes by Streamlit, no base64 data URI in the page. The data is a
+        # callable, so the frame is only encoded when the button is actually clicked
+        frame = st.session_state['last_image']
+        cache = st.session_state.setdefault('jpeg_cache', {})
+        st.download_button(
+            'Unduh 💾',
+            data=lambda: self.__jpeg(frame, cache),
+            file_name=f"detected_image_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg",
+            mime='image/jpeg',
+            disabled=frame is None,
+            help='Tidak ada gambar yang terdeteksi untuk diunduh.' if frame is None else None,
+        )
+
+    def __download_zip_button(self, frames):
+        cache = st.session_state.setdefault('jpeg_cache', {})
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        st.download_button('Unduh Semua (ZIP) 🗂️', data=lambda: self.__zip(frames, cache, timestamp),
+                           file_name=f'detected_images_{timestamp}.zip', mime='application/zip')
+
+    @classmethod
+    def __zip(cls, frames, cache, timestamp):
+        # Built only when the button is clicked; Streamlit reads the whole result into bytes, so a
+        # BytesIO is as good as a temp file. JPEGs are already compressed, so they are stored rather
+        # than deflated again
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_STORED) as zf:
+            for pot_id, frame in frames.items():
+                zf.writestr(f'pot_{pot_id}_{timestamp}.jpg', cls.__jpeg(frame, cache))
+        archive.seek(0)
+        return archive
+
+    @staticmethod
+    def __jpeg(frame, cache):
+        # Each frame is encoded once; the entry keeps the frame itself so its id can't be reused.
+        # Runs on download requests too, so it only touches the cache dict, not st.session_state
+        entry = cache.get(id(frame))
+        if entry is None or entry[0] is not frame:
+            success, buffer = cv2.imencode('.jpg', frame)
+            if not success:
+                raise ValueError('Gagal mengkodekan gambar untuk diunduh.')
+            entry = cache[id(frame)] = (frame, buffer.tobytes())
+        return entry[1]
+
+    def __prune_jpeg_cache(self):
+        # Drop encodings of frames the session no longer shows
+        live = {id(frame) for frame in [st.session_state['last_image'], *st.session_state['grid_images'].values()]}
+        cache = st.session_state.get('jpeg_cache', {})
+        for frame_id in list(cache):
+            if frame_id not in live:
+                del cache[frame_id]
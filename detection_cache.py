@@ -0,0 +1,151 @@
+import streamlit as st
+import cv2
+import numpy as np
+import hashlib
+import os
+import threading
+import logging
+from shared_cache import TTLCache
+
+# Optional on-disk layer shared across restarts; disabled when unset
+DETECTION_CACHE_DIR = os.environ.get('DETECTION_CACHE_DIR')
+# Files kept in that directory; the least recently used ones are deleted beyond this
+DETECTION_CACHE_MAX_FILES = int(os.environ.get('DETECTION_CACHE_MAX_FILES', 1000))
+
+def image_digest(buffer):
+    return hashlib.blake2b(buffer, digest_size=16).hexdigest()
+
+def detection_from_result(result):
+    """The parts of an ultralytics result worth keeping: boxes, classes and the rendered frame."""
+    boxes = result.boxes
+    return {
+        'xyxy': boxes.xyxy.cpu().numpy(),
+        'cls': boxes.cls.cpu().numpy().astype(int),
+        'conf': boxes.conf.cpu().numpy(),
+        'names': [result.names[int(c)] for c in boxes.cls],
+        'frame': result.plot(),
+    }
+
+class DetectionCache:
+    """Content-addressed detection results: image hash + model version + conf -> detection.
+
+    Also remembers the HTTP validators and hash of the last image seen per URL, so a
+    304 from the camera endpoint maps straight back to a cached result.
+    """
+
+    def __init__(self, max_entries=128, disk_dir=DETECTION_CACHE_DIR, max_disk_files=DETECTION_CACHE_MAX_FILES):
+        self.__memory = TTLCache(ttl=float('inf'), max_size=max_entries)
+        self.__disk_dir = disk_dir
+        self.__max_disk_files = max_disk_files
+        self.__images = {} # url -> (validators, digest)
+        self.__lock = threading.Lock()
+        self.__disk_files = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.__disk_files = len(self.__disk_entries())
+
+    @staticmethod
+    def key(digest, model_version, conf):
+        return f'{digest}-{hashlib.blake2b(model_version.encode(), digest_size=8).hexdigest()}-{conf:g}'
+
+    def get(self, key):
+        detection = self.__memory.get(key)
+        if detection is None and self.__disk_dir:
+            detection = self.__load(key)
+            if detection is not None:
+                self.__memory.put(key, detection)
+        return detection
+
+    def put(self, key, detection):
+        self.__memory.put(key, detection)
+        if self.__disk_dir:
+            self.__save(key, detection)
+
+    def lookup(self, client, url, model_version, conf):
+        """Fetches the image at `url` unless unchanged. Returns (cache key, cached detection or None, image bytes).
+
+        Revalidates with the validators remembered for `url`, so an unchanged image (HTTP 304 or
+        same content hash) maps straight to its cached detection without being downloaded.
+        """
+        validators, digest = self.image_for(url)
+        response, validators = client.conditional_get(url, validators)
+        content = None
+        if response is not None:
+            content = response.content
+            digest = image_digest(content)
+            self.remember_image(url, validators, digest)
+
+        key = self.key(digest, model_version, conf)
+        detection = self.get(key)
+        if detection is None and content is None:
+            # Not modified, but the result has been evicted: download the image again
+            self.remember_image(url, None, None)
+            return self.lookup(client, url, model_version, conf)
+        return key, detection, content
+
+    def image_for(self, url):
+        """(validators, digest) of the last image fetched from `url`, or (None, None)."""
+        with self.__lock:
+            return self.__images.get(url, (None, None))
+
+    def remember_image(self, url, validators, digest):
+        with self.__lock:
+            self.__images[url] = (validators, digest)
+
+    def stats(self):
+        return self.__memory.stats()
+
+    def __path(self, key):
+        return os.path.join(self.__disk_dir, f'{key}.npz')
+
+    def __save(self, key, detection):
+        # The frame is stored as JPEG: a fraction of the raw array's size
+        success, encoded = cv2.imencode('.jpg', detection['frame'])
+        if not success:
+            return
+        try:
+            tmp_path = self.__path(key) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, xyxy=detection['xyxy'], cls=detection['cls'], conf=detection['conf'],
+                         names=np.array(detection['names'], dtype=str), frame=encoded)
+            os.replace(tmp_path, self.__path(key)) # Atomic, readers never see half a file
+        except OSError as e:
+            logging.warning(f"Could not write detection cache entry {key}: {e}")
+            return
+        with self.__lock:
+            self.__disk_files += 1
+            if self.__disk_files > self.__max_disk_files:
+                self.__prune_disk()
+
+    def __disk_entries(self):
+        return [entry for entry in os.scandir(self.__disk_dir) if entry.name.endswith('.npz')]
+
+    def __prune_disk(self):
+        # Down to 90% of the cap, so the directory isn't rescanned on every write
+        entries = sorted(self.__disk_entries(), key=lambda entry: entry.stat().st_mtime)
+        excess = len(entries) - int(self.__max_disk_files * 0.9)
+        for entry in entries[:max(excess, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass # Already removed by another process sharing the directory
+        self.__disk_files = len(entries) - max(excess, 0)
+
+    def __load(self, key):
+        try:
+            os.utime(self.__path(key)) # Pruning removes the least recently used files first
+            with np.load(self.__path(key)) as data:
+                return {
+                    'xyxy': data['xyxy'],
+                    'cls': data['cls'],
+                    'conf': data['conf'],
+                    'names': data['names'].tolist(),
+                    'frame': cv2.imdecode(data['frame'], cv2.IMREAD_COLOR),
+                }
+        except (OSError, KeyError, ValueError):
+            return None
+
+@st.cache_resource
+def get_detection_cache():
+    # Cached resource -> shared by every session in this server process
+    return DetectionCache()
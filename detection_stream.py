@@ -0,0 +1,134 @@
+import threading
+import time
+import logging
+from image_io import decode_image
+
+class DetectionStream:
+    """Background fetch -> decode -> YOLO -> plot pipeline for one camera.
+
+    A producer thread pulls frames at the target FPS into a single-slot buffer; the
+    inference thread always takes the newest frame, so frames that arrive while
+    inference is busy are dropped instead of queueing up.
+    """
+
+    STAGES = ('fetch', 'decode', 'inference', 'plot')
+    IDLE_TIMEOUT = 15 # Seconds without a reader before the stream stops itself
+
+    def __init__(self, url, client, predict, target_fps=2.0, conf=0.5, target_size=None):
+        self.url = url
+        self.target_fps = target_fps
+        self.conf = conf
+        self.__client = client # PotApiClient: pooled session, timeouts and request metrics
+        self.__predict = predict
+        self.__target_size = target_size
+
+        self.__stop = threading.Event()
+        self.__frame_ready = threading.Condition()
+        self.__pending_frame = None # Newest decoded frame not yet inferred
+        self.__latest = None # Newest annotated frame
+        self.__last_read = time.monotonic()
+        self.__threads = []
+
+        self.__latency = {stage: None for stage in self.STAGES} # EMA, seconds
+        self.__fps = None
+        self.__last_output = None
+        self.__dropped = 0
+        self.__processed = 0
+        self.last_error = None
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self.__threads)
+
+    def start(self):
+        if self.running:
+            return
+        self.__stop.clear()
+        self.__last_read = time.monotonic()
+        self.__threads = [
+            threading.Thread(target=self.__produce, name='detection-fetch', daemon=True),
+            threading.Thread(target=self.__infer, name='detection-infer', daemon=True),
+        ]
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        with self.__frame_ready:
+            self.__frame_ready.notify_all()
+
+    def latest(self):
+        """Newest annotated BGR frame (or None). Reading it keeps the stream alive."""
+        self.__last_read = time.monotonic()
+        return self.__latest
+
+    def stats(self):
+        return {
+            'fps': self.__fps,
+            'latency_s': dict(self.__latency),
+            'processed': self.__processed,
+            'dropped': self.__dropped,
+        }
+
+    def __produce(self):
+        while not self.__stop.is_set():
+            started = time.monotonic()
+            if started - self.__last_read > self.IDLE_TIMEOUT:
+                logging.info(f"Stopping idle detection stream for {self.url}")
+                self.stop()
+                break
+            try:
+                response, _ = self.__client.conditional_get(self.url)
+                fetched = time.monotonic()
+                self.__record('fetch', fetched - started)
+
+                frame = decode_image(response.content, self.__target_size)
+                if frame is None:
+                    raise ValueError('Gagal membaca gambar dari URL')
+                self.__record('decode', time.monotonic() - fetched)
+
+                with self.__frame_ready:
+                    if self.__pending_frame is not None:
+                        self.__dropped += 1 # Inference fell behind, replace the stale frame
+                    self.__pending_frame = frame
+                    self.__frame_ready.notify()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                logging.warning(f"Detection stream fetch failed for {self.url}: {e}")
+
+            # Sleep only for what is left of this frame's time slot
+            self.__stop.wait(max(1.0 / self.target_fps - (time.monotonic() - started), 0))
+
+    def __infer(self):
+        while not self.__stop.is_set():
+            with self.__frame_ready:
+                while self.__pending_frame is None and not self.__stop.is_set():
+                    self.__frame_ready.wait()
+                frame, self.__pending_frame = self.__pending_frame, None
+            if frame is None:
+                break
+            try:
+                started = time.monotonic()
+                results = self.__predict(frame, conf=self.conf)
+                inferred = time.monotonic()
+                self.__record('inference', inferred - started)
+
+                self.__latest = results[0].plot()
+                done = time.monotonic()
+                self.__record('plot', done - inferred)
+
+                if self.__last_output is not None:
+                    self.__fps = self.__ema(self.__fps, 1.0 / max(done - self.__last_output, 1e-6))
+                self.__last_output = done
+                self.__processed += 1
+            except Exception as e:
+                self.last_error = e
+                logging.exception(f"Detection stream inference failed for {self.url}")
+
+    def __record(self, stage, seconds):
+        self.__latency[stage] = self.__ema(self.__latency[stage], seconds)
+
+    @staticmethod
+    def __ema(previous, value, alpha=0.2):
+        return value if previous is None else previous + alpha * (value - previous)
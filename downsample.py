@@ -0,0 +1,31 @@
+import numpy as np
+
+def minmax_indices(series, max_points):
+    """Indices to keep so every series still shows its peaks in at most ~max_points points.
+
+    The samples are split into equal buckets and each bucket keeps the position of the
+    minimum and maximum of every series (min/max bucketing). Fully vectorized: the
+    buckets are a reshaped view, not a Python loop.
+    """
+    size = len(series[0]) if series else 0
+    if size <= max_points:
+        return np.arange(size)
+
+    # Each bucket contributes up to 2 points per series
+    buckets = max(max_points // (2 * len(series)), 1)
+    bucket_size = -(-size // buckets) # ceil
+    padded_size = buckets * bucket_size
+
+    keep = [np.array([0, size - 1])] # Always keep both ends so the x-range is unchanged
+    offsets = np.arange(buckets) * bucket_size
+    for values in series:
+        grid = np.full(padded_size, np.nan)
+        grid[:size] = values
+        grid = grid.reshape(buckets, bucket_size)
+        # NaNs must never win, so push them to the far end before arg{min,max}
+        lows = np.argmin(np.where(np.isnan(grid), np.inf, grid), axis=1) + offsets
+        highs = np.argmax(np.where(np.isnan(grid), -np.inf, grid), axis=1) + offsets
+        keep.extend((lows, highs))
+
+    indices = np.unique(np.concatenate(keep))
+    return indices[indices < size]
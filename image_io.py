@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+from metrics import metrics
+
+# (factor, flag) from largest to smallest reduction; libjpeg scales while decoding,
+# so a reduced decode is faster and allocates a proportionally smaller frame
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Start-of-frame markers carrying the image size (C4/C8/CC are DHT/JPG/DAC)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def jpeg_size(buffer):
+    """(width, height) read from the JPEG header without decoding, or None."""
+    data = memoryview(buffer)
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF: # Fill byte
+            i += 1
+            continue
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS:
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + length
+    return None
+
+def decode_image(buffer, target_size=None):
+    """Decodes an encoded image straight from `buffer` (bytes, no copy) into a BGR frame.
+
+    With `target_size`, large JPEGs are decoded at 1/2, 1/4 or 1/8 resolution as long as
+    the short side stays at or above the model's input size.
+    """
+    encoded = np.frombuffer(buffer, dtype=np.uint8) # A view over the response bytes
+    flag = cv2.IMREAD_COLOR
+    if target_size:
+        size = jpeg_size(buffer)
+        if size is not None:
+            short_side = min(size)
+            for factor, reduced_flag in _REDUCED_FLAGS:
+                if short_side // factor >= target_size:
+                    flag = reduced_flag
+                    break
+    with metrics.timer('image_decode_seconds', reduced=flag != cv2.IMREAD_COLOR):
+        return cv2.imdecode(encoded, flag)
@@ -0,0 +1,202 @@
+import streamlit as st
+import asyncio
+import contextlib
+import itertools
+import os
+import queue
+import random
+import threading
+import time
+import logging
+from model_genai import get_model_genai
+from metrics import metrics
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Provider limits for the configured key/model; the defaults fit the Gemini free tier
+GEMINI_RPM = float(os.environ.get('GEMINI_RPM', 15))
+GEMINI_CONCURRENCY = int(os.environ.get('GEMINI_CONCURRENCY', 4))
+
+_DONE = object()
+
+class RateLimitError(Exception):
+    """The provider kept answering 429 / quota exhausted after all retries."""
+
+def is_rate_limit_error(error):
+    # google-api-core raises ResourceExhausted; other transports surface a plain 429
+    text = f'{type(error).__name__} {error}'.lower()
+    return 'resourceexhausted' in text or '429' in text or 'quota' in text or 'rate limit' in text
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.__tokens = burst
+        self.__updated = time.monotonic()
+
+    async def acquire(self):
+        # Only touched from the dispatcher's event loop, so no lock is needed
+        while True:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            if self.__tokens >= 1:
+                self.__tokens -= 1
+                return
+            await asyncio.sleep((1 - self.__tokens) / self.rate)
+
+class DispatchedStream:
+    """Iterator over one queued request's chunks, consumed from the Streamlit script thread.
+
+    `queue_timeout` bounds the wait until a worker starts the request; `timeout` then bounds
+    each gap between chunks. Once the consumer stops iterating (timeout, error, rerun or
+    logout), `cancelled` is set and the dispatcher drops the request or stops its stream.
+    """
+
+    def __init__(self, inputs, priority, timeout, queue_timeout):
+        self.inputs = inputs
+        self.priority = priority
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.cancelled = False
+        self.__timeout = timeout
+        self.__queue_timeout = queue_timeout
+        self.chunks = queue.Queue()
+
+    @property
+    def wait_time(self):
+        return (self.started_at or time.monotonic()) - self.queued_at
+
+    def __iter__(self):
+        last_chunk_at = None
+        try:
+            while True:
+                # started_at is set by the dispatcher thread; re-read it on every wait
+                if self.started_at is None:
+                    deadline = self.queued_at + self.__queue_timeout
+                else:
+                    deadline = max(self.started_at, last_chunk_at or 0) + self.__timeout
+                try:
+                    item = self.chunks.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    if self.started_at is None:
+                        raise TimeoutError('LLM request waited too long in the dispatcher queue')
+                    if time.monotonic() >= max(self.started_at, last_chunk_at or 0) + self.__timeout:
+                        raise TimeoutError('LLM stream timed out waiting for the next chunk')
+                    continue # Started while we waited on the queue deadline
+                last_chunk_at = time.monotonic()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.cancelled = True
+
+class LlmDispatcher:
+    """Shared asyncio front for a LangChain chain: priority queue, token-bucket rate
+    limit, bounded concurrency and exponential backoff on 429."""
+
+    def __init__(self, chain, requests_per_minute=GEMINI_RPM, max_concurrency=GEMINI_CONCURRENCY,
+                 burst=3, max_retries=4, base_backoff=2.0):
+        self.__chain = chain
+        self.__bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.__max_retries = max_retries
+        self.__base_backoff = base_backoff
+        self.__sequence = itertools.count() # FIFO order within one priority
+        self.__stats = {'submitted': 0, 'started': 0, 'completed': 0, 'failed': 0, 'rate_limited': 0, 'cancelled': 0,
+                        'in_flight': 0, 'total_wait_s': 0.0, 'max_wait_s': 0.0}
+
+        self.__loop = asyncio.new_event_loop()
+        self.__queue = None
+        ready = threading.Event()
+        threading.Thread(target=self.__run_loop, args=(max_concurrency, ready),
+                         name='llm-dispatcher', daemon=True).start()
+        ready.wait()
+
+    def stream(self, inputs, priority=PRIORITY_NORMAL, timeout=120, queue_timeout=300):
+        """Queues a chain.stream(inputs) call; iterate the result to receive chunks.
+
+        Stop iterating (or close the iterator) to cancel the call.
+        """
+        request = DispatchedStream(inputs, priority, timeout, queue_timeout)
+        self.__stats['submitted'] += 1
+        self.__loop.call_soon_threadsafe(self.__queue.put_nowait, (priority, next(self.__sequence), request))
+        return request
+
+    def stats(self):
+        stats = dict(self.__stats, queue_depth=self.__queue.qsize())
+        stats['avg_wait_s'] = stats['total_wait_s'] / stats['started'] if stats['started'] else 0.0
+        return stats
+
+    def __run_loop(self, max_concurrency, ready):
+        asyncio.set_event_loop(self.__loop)
+        self.__queue = asyncio.PriorityQueue()
+        # A fixed number of workers bounds how many calls run at once
+        for _ in range(max_concurrency):
+            self.__loop.create_task(self.__worker())
+        self.__loop.call_soon(ready.set)
+        self.__loop.run_forever()
+
+    async def __worker(self):
+        while True:
+            _, _, request = await self.__queue.get()
+            try:
+                await self.__process(request)
+            finally:
+                self.__queue.task_done()
+
+    async def __process(self, request):
+        for attempt in range(self.__max_retries + 1):
+            # Nobody is reading anymore; don't spend a rate-limit token on it
+            if request.cancelled:
+                self.__cancel(request)
+                return
+            await self.__bucket.acquire()
+            if request.started_at is None:
+                request.started_at = time.monotonic()
+                self.__stats['started'] += 1
+                self.__stats['total_wait_s'] += request.wait_time
+                self.__stats['max_wait_s'] = max(self.__stats['max_wait_s'], request.wait_time)
+                metrics.observe('llm_queue_wait_seconds', request.wait_time)
+            emitted = False
+            self.__stats['in_flight'] += 1
+            try:
+                async with contextlib.aclosing(self.__chain.astream(request.inputs)) as chunks:
+                    async for chunk in chunks:
+                        if request.cancelled:
+                            # Closing the stream ends the provider call and frees this worker
+                            self.__cancel(request)
+                            return
+                        emitted = True
+                        request.chunks.put(chunk)
+                request.chunks.put(_DONE)
+                self.__stats['completed'] += 1
+                return
+            except Exception as e:
+                # Retry only if nothing reached the user yet; a half-streamed answer can't be replayed
+                if is_rate_limit_error(e) and not emitted:
+                    self.__stats['rate_limited'] += 1
+                    metrics.count('llm_rate_limited_total')
+                    if attempt < self.__max_retries:
+                        delay = self.__base_backoff * 2 ** attempt * (1 + random.random() * 0.25)
+                        logging.warning(f"Gemini rate limited, retrying in {delay:.1f}s (attempt {attempt + 1})")
+                        await asyncio.sleep(delay)
+                        continue
+                    e = RateLimitError(str(e))
+                self.__stats['failed'] += 1
+                request.chunks.put(e)
+                return
+            finally:
+                self.__stats['in_flight'] -= 1
+
+    def __cancel(self, request):
+        self.__stats['cancelled'] += 1
+        metrics.count('llm_cancelled_total')
+
+@st.cache_resource(show_spinner=False)
+def get_llm_dispatcher(api_key):
+    # One queue and rate limiter per API key, shared by every session in this process
+    return LlmDispatcher(get_model_genai(api_key).chain)
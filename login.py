@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import logging # Add logging
+from login_service import get_login_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -31,30 +32,18 @@ def show_login_page():
             st.session_state['chat_id'] = chat_id_input # Store entered chat_id
             st.session_state['login_error'] = "" # Clear previous errors
             try:
-                # --- Replace with your actual API endpoint to get pot_ids ---
-                # Example: Assuming an endpoint /get/pots/{chat_id} returns {"pot_ids": ["id1", "id2"]}
-                api_url = f"https://api-smart-pot-test.vercel.app/find/user/{chat_id_input}"
-                logging.info(f"Attempting to fetch pot IDs from: {api_url}")
-                response = requests.get(api_url)
-                response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+                # Cached, bounded-timeout lookup over the shared pooled session
+                logging.info(f"Looking up pot IDs for chat_id: {chat_id_input}")
+                login_service = get_login_service()
+                fetched_pot_ids = login_service.lookup(chat_id_input)
 
-                data = response.json()
-                logging.info(f"API Response: {data}")
-
-                fetched_pot_ids = None # Initialize fetched_pot_ids
-
-                # --- Adjust based on the actual structure of your API response ---
-                # Case 1: API returns a dictionary like {"pot_ids": [id1, id2]}
-                if isinstance(data, dict) and 'pot_ids' in data and isinstance(data['pot_ids'], list):
-                    fetched_pot_ids = data['pot_ids']
-                # Case 2: API returns a list directly like [id1, id2]
-                elif isinstance(data, list):
-                     fetched_pot_ids = data # Directly use the list
                 if fetched_pot_ids: # Check if the list is not empty
                     st.session_state['pot_ids'] = fetched_pot_ids
                     st.session_state['logged_in'] = True
                     st.session_state['selected_page'] = 'Dashboard' # Default to Dashboard after login
                     logging.info(f"Login successful for chat_id: {chat_id_input}, pot_ids: {fetched_pot_ids}")
+                    # Start loading the first dashboard snapshot while the app reruns
+                    login_service.prefetch_dashboard(fetched_pot_ids)
                     st.rerun() # Rerun to reflect login state in main.py
                 else:
                     st.session_state['login_error'] = "No pots found for this Chat ID."
@@ -0,0 +1,57 @@
+import streamlit as st
+import logging
+from pot_api import get_pot_api_client
+from shared_cache import TTLCache
+
+class LoginService:
+    """chat_id -> pot_ids lookups with a process-wide TTL cache, plus dashboard prefetch."""
+
+    def __init__(self, client, ttl=300, max_users=1024):
+        self.__client = client
+        self.__cache = TTLCache(ttl=ttl, max_size=max_users)
+
+    def lookup(self, chat_id):
+        """pot_ids for `chat_id`; concurrent logins for the same id share one request."""
+        pot_ids = self.__cache.get_or_load(chat_id, self.__fetch_pot_ids)
+        if not pot_ids:
+            # Don't keep "no pots" around: the user may be adding one right now
+            self.__cache.invalidate(chat_id)
+        return pot_ids
+
+    def prefetch_dashboard(self, pot_ids):
+        """Warms the shared sensor store in the background so the Dashboard renders from warm data."""
+        # Imported here so the login page doesn't pay for pandas at startup
+        from sensor_history import get_sensor_store
+        store = get_sensor_store()
+        futures = self.__client.submit_many(pot_ids, store.get)
+        for pot_id, future in futures.items():
+            future.add_done_callback(self.__log_prefetch_failure(pot_id))
+        return futures
+
+    def stats(self):
+        return self.__cache.stats()
+
+    @staticmethod
+    def __log_prefetch_failure(pot_id):
+        def callback(future):
+            if future.exception() is not None:
+                logging.warning(f"Prefetch failed for pot {pot_id}: {future.exception()}")
+        return callback
+
+    def __fetch_pot_ids(self, chat_id):
+        data = self.__client.fetch_user(chat_id)
+        logging.info(f"API Response: {data}")
+
+        # --- Adjust based on the actual structure of your API response ---
+        # Case 1: API returns a dictionary like {"pot_ids": [id1, id2]}
+        if isinstance(data, dict) and 'pot_ids' in data and isinstance(data['pot_ids'], list):
+            return data['pot_ids']
+        # Case 2: API returns a list directly like [id1, id2]
+        if isinstance(data, list):
+            return data
+        return []
+
+@st.cache_resource
+def get_login_service():
+    # Cached resource -> shared cache and pooled session for every session in this process
+    return LoginService(get_pot_api_client())
@@ -1,9 +1,12 @@
 import streamlit as st
 import logging
-from detection import DetectionPage
-from chat import ChatPage
-from dashboard import DashboardPage
+import os
 from login import show_login_page # Import the login function
+from page_registry import PageRegistry, clear_pages # Pages are imported lazily, on first use
+from metrics import metrics
+
+# Chat IDs that get the live metrics panel in the sidebar (comma separated)
+ADMIN_CHAT_IDS = {chat_id.strip() for chat_id in os.environ.get('ADMIN_CHAT_IDS', '').split(',') if chat_id.strip()}
 
 class Main:
     def __init__(self):
@@ -15,6 +18,7 @@ class Main:
         logging.getLogger('langchain').setLevel(logging.ERROR)
         logging.getLogger('langchain_google_genai').setLevel(logging.ERROR)
         logging.getLogger('httpx').setLevel(logging.ERROR)
+        metrics.serve() # No-op unless METRICS_PORT is set, and only starts once per process
 
         # Initialize session state for login status if not already done
         if 'logged_in' not in st.session_state:
@@ -26,15 +30,11 @@ class Main:
         if st.session_state['logged_in'] and 'selected_page' not in st.session_state:
             st.session_state['selected_page'] = 'Dashboard'
 
-        # Instantiate pages only if logged in and pot_ids are available
+        # Register pages only if logged in and pot_ids are available
         self.pages = {}
         if st.session_state['logged_in'] and st.session_state['pot_ids']:
-             # Pass pot_ids to pages that need it
-             self.pages = {
-                 'Dashboard': DashboardPage(st.session_state['pot_ids']),
-                 'Detection': DetectionPage(st.session_state['pot_ids']), # Assuming Detection also needs pot_ids
-                 'Chat': ChatPage(), # Assuming Chat doesn't need pot_ids
-             }
+             # Each page is imported and built the first time it is shown, then reused across reruns
+             self.pages = PageRegistry(st.session_state['pot_ids'])
         elif st.session_state['logged_in'] and not st.session_state['pot_ids']:
              # Handle case where user is logged in but has no pots (might show a message)
              logging.warning(f"User {st.session_state.get('chat_id', 'Unknown')} logged in but has no pot IDs.")
@@ -67,6 +67,15 @@ class Main:
                          del st.session_state['selected_page'] # Remove selected page
                     if 'monitoring_active' in st.session_state: # Clear dashboard state if exists
                          del st.session_state['monitoring_active']
+                    # Camera images and their encodings must not carry over to the next user
+                    if st.session_state.get('detection_stream') is not None:
+                         st.session_state['detection_stream'].stop()
+                    for key in ('detection_stream', 'is_streaming', 'last_image', 'grid_images', 'jpeg_cache'):
+                         st.session_state.pop(key, None)
+                    # Chat answers can quote this user's pot readings
+                    st.session_state.pop('last_message', None)
+                    st.session_state.pop('pot_refresh_intervals', None) # Per-pot overrides are this user's
+                    clear_pages() # Drop this user's page objects
                     st.rerun() # Rerun to go back to login page
 
                 st.divider() # Separator
@@ -77,6 +86,41 @@ class Main:
                         st.session_state['selected_page'] = page_name
                         st.rerun() # Rerun to switch page
 
+                self.__show_metrics_panel()
+
+    def __show_metrics_panel(self):
+        if not metrics.enabled or st.session_state.get('chat_id') not in ADMIN_CHAT_IDS:
+            return
+        st.divider()
+        with st.expander('Metrics 📊'):
+            # Refreshes on its own timer without rerunning the page
+            st.fragment(self.__show_metrics, run_every=5)()
+            self.__show_page_profile()
+
+    def __show_page_profile(self):
+        # Startup cost of the lazily built pages; shown from the rerun after a page's first build
+        profile = self.pages.profile() if isinstance(self.pages, PageRegistry) else {}
+        for name, times in profile.items():
+            import_ms = f"{times['import_s'] * 1000:.0f} ms" if times['import_s'] is not None else 'cached'
+            st.caption(f"{name}: import {import_ms}, build {times['build_s'] * 1000:.0f} ms")
+
+    @staticmethod
+    def __show_metrics():
+        snapshot = metrics.snapshot()
+        rows = [{
+            'metric': timing['name'],
+            'labels': ', '.join(f'{key}={value}' for key, value in timing['labels'].items()),
+            'count': timing['count'],
+            'p50 ms': round(timing.get('p50_s', 0) * 1000, 1),
+            'p95 ms': round(timing.get('p95_s', 0) * 1000, 1),
+        } for timing in snapshot['timings']]
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption('Belum ada data.')
+        for counter in snapshot['counters']:
+            st.caption(f"{counter['name']}: {counter['value']}")
+
     def run(self):
         if not st.session_state['logged_in']:
             show_login_page() # Show login page if not logged in
@@ -92,5 +136,6 @@ class Main:
              show_login_page() # Default to login page
 
 if __name__ == '__main__':
-    main = Main()
-    main.run()
+    with metrics.timer('rerun_seconds', page=st.session_state.get('selected_page', 'Login')):
+        main = Main()
+        main.run()
@@ -0,0 +1,185 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Off by default; METRICS_PORT also turns recording on and serves /metrics and /metrics.json
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 0)) or None
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes') or METRICS_PORT is not None
+METRICS_PREFIX = 'smartpot_'
+
+# Histogram bucket bounds in seconds, from a cache hit to a slow LLM answer
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NULL_TIMER = nullcontext() # Stateless, so one instance serves every disabled timer
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus, plus a window of recent samples for percentiles."""
+
+    def __init__(self, buckets=BUCKETS, window=1024):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def summary(self):
+        values = sorted(self.recent)
+        summary = {'count': self.count, 'sum_s': self.sum}
+        if values:
+            for name, q in (('p50_s', 0.5), ('p95_s', 0.95), ('p99_s', 0.99)):
+                summary[name] = values[min(int(q * len(values)), len(values) - 1)]
+            summary['max_s'] = values[-1]
+        return summary
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+class Metrics:
+    """Process-wide timings and counters for the app's hot paths.
+
+    When disabled, `timer` returns a shared no-op context manager and `observe`/`count`
+    return immediately, so instrumented code pays one attribute check per call.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.__histograms = {} # (name, labels) -> Histogram
+        self.__counters = {} # (name, labels) -> number
+        self.__lock = threading.Lock()
+        self.__server = None
+
+    def timer(self, name, **labels):
+        """`with metrics.timer('chart_build_seconds', pot=...):` records the block's duration."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = self.__key(name, labels)
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = self.__histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self.__key(name, labels)
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def snapshot(self):
+        """{'timings': [...], 'counters': [...]} with one row per metric and label set."""
+        with self.__lock:
+            timings = [dict(name=name, labels=dict(labels), **histogram.summary())
+                       for (name, labels), histogram in sorted(self.__histograms.items())]
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.__counters.items())]
+        return {'timings': timings, 'counters': counters}
+
+    def prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self.__lock:
+            histograms = sorted(self.__histograms.items())
+            counters = sorted(self.__counters.items())
+            for i, ((name, labels), histogram) in enumerate(histograms):
+                full_name = METRICS_PREFIX + name
+                if i == 0 or histograms[i - 1][0][0] != name:
+                    lines.append(f'# TYPE {full_name} histogram')
+                cumulative = 0
+                bounds = [f'{bound:g}' for bound in histogram.buckets] + ['+Inf']
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{full_name}_bucket{self.__labels(labels, le=bound)} {cumulative}')
+                lines.append(f'{full_name}_sum{self.__labels(labels)} {histogram.sum}')
+                lines.append(f'{full_name}_count{self.__labels(labels)} {histogram.count}')
+            for i, ((name, labels), value) in enumerate(counters):
+                full_name = METRICS_PREFIX + name
+                if i == 0 or counters[i - 1][0][0] != name:
+                    lines.append(f'# TYPE {full_name} counter')
+                lines.append(f'{full_name}{self.__labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=METRICS_PORT, host='0.0.0.0'):
+        """Starts (once per process) a background HTTP server with /metrics and /metrics.json."""
+        with self.__lock:
+            if self.__server is not None or not port:
+                return self.__server
+            try:
+                self.__server = ThreadingHTTPServer((host, port), self.__handler())
+            except OSError as e:
+                logging.warning(f'Metrics server not started on port {port}: {e}')
+                return None
+            self.__server.daemon_threads = True
+        threading.Thread(target=self.__server.serve_forever, name='metrics-http', daemon=True).start()
+        logging.info(f'Metrics served on http://{host}:{port}/metrics')
+        return self.__server
+
+    @staticmethod
+    def __key(name, labels):
+        # Label values are stored as strings so keys always sort and export the same way
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def __labels(labels, **extra):
+        pairs = list(labels) + list(extra.items())
+        if not pairs:
+            return ''
+        escape = lambda value: value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in pairs) + '}'
+
+    def __handler(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.prometheus().encode(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(metrics.snapshot()).encode(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # Scrapes every few seconds would flood the app log
+
+        return Handler
+
+# Module-level rather than a cached resource: hot paths call it on every request,
+# and it must work in worker threads without a Streamlit script context
+metrics = Metrics()
@@ -5,12 +5,16 @@ from langchain_core.runnables import RunnableMap, RunnablePassthrough
 # import os
 import streamlit as st
 
+DEFAULT_MODEL = 'gemini-1.5-pro'
+
 class ModelGenai():
-    def __init__(self):
-        self.__GOOGLE_API_KEY = st.secrets['GOOGLE_API_KEY']
-        self.__model = 'gemini-1.5-pro'
+    def __init__(self, api_key=None, model=DEFAULT_MODEL):
+        self.__GOOGLE_API_KEY = api_key or st.secrets['GOOGLE_API_KEY']
+        self.__model = model
         
         self.__system_template = 'Kamu adalah asisten ahli tanaman dan juga teman saya. Jangan memberikan pertanyaan di akhir karena kamu tidak bisa mengingat'
+        # Precomputed sensor/detection summary of the user's pots, empty when not used
+        self.__system_template += '\n\nData pot pengguna (gunakan jika relevan):\n{pot_context}'
         self.__human_template = '{input}'
         
         self.__prompt_template = ChatPromptTemplate.from_messages([
@@ -25,5 +29,8 @@ class ModelGenai():
         )
 
         self.chain = self.__prompt_template | self.__llm
-        
 
+@st.cache_resource(show_spinner=False)
+def get_model_genai(api_key, model=DEFAULT_MODEL):
+    # One prompt chain and LLM client (with its HTTP connections) per API key and model, per process
+    return ModelGenai(api_key, model)
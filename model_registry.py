@@ -0,0 +1,139 @@
+import streamlit as st
+import numpy as np
+import os
+import threading
+import time
+import logging
+from ultralytics import YOLO
+from metrics import metrics
+
+try:
+    import psutil # Installed together with ultralytics
+except ImportError:
+    psutil = None
+
+# Inference backend for the detector: 'pytorch' (eager), 'onnx' or 'openvino'
+DETECTION_BACKEND = os.environ.get('DETECTION_BACKEND', 'pytorch').lower()
+DETECTION_INT8 = os.environ.get('DETECTION_INT8', '').lower() in ('1', 'true', 'yes')
+
+class ModelRegistry:
+    """Loads each YOLO weight file once per process and shares it across sessions."""
+
+    def __init__(self):
+        self.__models = {}
+        self.__stats = {}
+        self.__locks = {}
+        self.__inference_locks = {}
+        self.__registry_lock = threading.Lock()
+
+    def get(self, model_file):
+        # Fast path: model already loaded by this or another session
+        model = self.__models.get(model_file)
+        if model is not None:
+            return model
+
+        # One lock per weight file so two sessions don't load the same file twice
+        with self.__registry_lock:
+            lock = self.__locks.setdefault(model_file, threading.Lock())
+        with lock:
+            if model_file not in self.__models:
+                self.__inference_locks[model_file] = threading.Lock()
+                self.__models[model_file] = self.__load(model_file)
+            return self.__models[model_file]
+
+    def resolve(self, model_file, backend=DETECTION_BACKEND, int8=DETECTION_INT8):
+        """Path of the weights to load for `backend`, exporting them once next to the .pt file."""
+        if backend == 'pytorch':
+            return model_file
+        if backend not in ('onnx', 'openvino'):
+            raise ValueError(f"Unknown detection backend: {backend}")
+        if int8 and backend != 'openvino':
+            logging.warning(f"INT8 quantization is only supported for OpenVINO, exporting {backend} in FP32")
+            int8 = False
+
+        stem = os.path.splitext(model_file)[0]
+        if backend == 'onnx':
+            exported = f'{stem}.onnx'
+        else:
+            exported = f'{stem}_int8_openvino_model' if int8 else f'{stem}_openvino_model'
+
+        with self.__registry_lock:
+            lock = self.__locks.setdefault(exported, threading.Lock())
+        with lock:
+            if not os.path.exists(exported):
+                start = time.perf_counter()
+                # INT8 calibration uses the dataset the weights were trained on (ultralytics default)
+                path = YOLO(model_file).export(format=backend, int8=int8)
+                logging.info(f"Exported {model_file} to {path} in {time.perf_counter() - start:.1f}s")
+                exported = str(path)
+        return exported
+
+    def predict(self, model_file, source, **kwargs):
+        # Ultralytics predictors keep per-call state, so a shared model runs one call at a time
+        model = self.get(model_file)
+        with self.__inference_locks[model_file]:
+            # Timed inside the lock: queueing behind another session isn't inference time
+            batch = len(source) if isinstance(source, list) else 1
+            with metrics.timer('inference_seconds', model=os.path.basename(model_file), batched=batch > 1):
+                return model(source, verbose=False, **kwargs)
+
+    def model_version(self, model_file):
+        # Changes whenever the weights (or their export) are replaced on disk
+        mtime = os.path.getmtime(model_file) if os.path.exists(model_file) else 0
+        return f'{model_file}@{mtime:.0f}'
+
+    def input_size(self, model_file):
+        return self.__imgsz(self.get(model_file))
+
+    def stats(self):
+        # Copy so callers can't mutate the registry's bookkeeping
+        return {model_file: dict(info) for model_file, info in self.__stats.items()}
+
+    def __load(self, model_file):
+        rss_before = self.__rss()
+        start = time.perf_counter()
+        # Exported models don't carry their task in a way YOLO() can always infer
+        model = YOLO(model_file) if model_file.endswith('.pt') else YOLO(model_file, task='detect')
+        load_time = time.perf_counter() - start
+
+        # Warm up with a dummy frame so the first real request doesn't pay for lazy init
+        imgsz = self.__imgsz(model)
+        start = time.perf_counter()
+        model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+        warmup_time = time.perf_counter() - start
+
+        rss_after = self.__rss()
+        self.__stats[model_file] = {
+            'load_time_s': load_time,
+            'warmup_time_s': warmup_time,
+            'param_bytes': self.__param_bytes(model),
+            'rss_delta_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        }
+        logging.info(f"Loaded model {model_file} in {load_time:.2f}s (warm-up {warmup_time:.2f}s): {self.__stats[model_file]}")
+        return model
+
+    @staticmethod
+    def __imgsz(model):
+        # Checkpoints store imgsz either as an int or as [height, width]
+        imgsz = model.overrides.get('imgsz', 640)
+        return max(imgsz) if isinstance(imgsz, (list, tuple)) else imgsz
+
+    @staticmethod
+    def __param_bytes(model):
+        try:
+            torch_model = model.model
+            tensors = list(torch_model.parameters()) + list(torch_model.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return None # Exported backends (ONNX etc.) have no torch parameters
+
+    @staticmethod
+    def __rss():
+        if psutil is None:
+            return None
+        return psutil.Process().memory_info().rss
+
+@st.cache_resource
+def get_model_registry():
+    # Cached resource -> one registry per Streamlit server process
+    return ModelRegistry()
@@ -0,0 +1,73 @@
+import streamlit as st
+import importlib
+import sys
+import time
+import logging
+from collections.abc import Mapping
+
+# Page name -> (module, class, whether the constructor takes pot_ids).
+# Modules are only imported when their page is first opened: detection pulls in
+# ultralytics/torch/cv2 and chat pulls in langchain/Google GenAI.
+PAGES = {
+    'Dashboard': ('dashboard', 'DashboardPage', True),
+    'Detection': ('detection', 'DetectionPage', True),
+    'Chat': ('chat', 'ChatPage', False),
+}
+
+# Process-wide record of how long each page module took to import (first import only)
+IMPORT_TIMES = {}
+
+class PageRegistry(Mapping):
+    """Lazily built pages for one session.
+
+    Behaves like the old `{name: page}` dict, but a page's module is imported and
+    its object constructed only the first time that page is looked up. The objects
+    are kept in session state, so later reruns reuse them.
+    """
+
+    def __init__(self, pot_ids):
+        self.__pot_ids = list(pot_ids)
+        state = st.session_state.get('page_objects')
+        if state is None or state['pot_ids'] != self.__pot_ids:
+            # New login or different pots: start over
+            state = {'pot_ids': self.__pot_ids, 'pages': {}, 'build_times': {}}
+            st.session_state['page_objects'] = state
+        self.__state = state
+
+    def __getitem__(self, name):
+        pages = self.__state['pages']
+        if name not in pages:
+            module_name, class_name, takes_pot_ids = PAGES[name]
+            module = import_page_module(module_name)
+            start = time.perf_counter()
+            page_class = getattr(module, class_name)
+            pages[name] = page_class(self.__pot_ids) if takes_pot_ids else page_class()
+            self.__state['build_times'][name] = time.perf_counter() - start
+            logging.info(f"Built page {name} in {self.__state['build_times'][name]:.3f}s "
+                         f"(import {IMPORT_TIMES.get(module_name, 0):.3f}s)")
+        return pages[name]
+
+    def __iter__(self):
+        return iter(PAGES)
+
+    def __len__(self):
+        return len(PAGES)
+
+    def profile(self):
+        """Import and construction time (seconds) of every page built so far."""
+        return {
+            name: {'import_s': IMPORT_TIMES.get(PAGES[name][0]), 'build_s': build_time}
+            for name, build_time in self.__state['build_times'].items()
+        }
+
+def import_page_module(module_name):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES[module_name] = time.perf_counter() - start
+    return module
+
+def clear_pages():
+    # Called on logout so the next user gets fresh page objects
+    st.session_state.pop('page_objects', None)
@@ -0,0 +1,105 @@
+import streamlit as st
+import requests
+import os
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import metrics
+
+API_BASE_URL = os.environ.get('SMART_POT_API_URL', 'https://api-smart-pot-test.vercel.app')
+
+class PotApiClient:
+    """Thin client for the smart-pot API with one pooled keep-alive session per process."""
+
+    def __init__(self, base_url=API_BASE_URL, max_concurrency=6, timeout=(3.05, 10), extra_connections=16):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout # (connect, read): a dead host fails fast, a slow one still gets 10s
+
+        # The session is shared by the pool workers and by callers outside the pool: script threads
+        # (login, detection lookups) and DetectionStream producers. The pool keeps a connection alive
+        # for each worker plus `extra_connections` for those, instead of discarding them under load.
+        # Idempotent GETs are retried with backoff on connection errors and gateway errors.
+        self.session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods={'GET'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency + extra_connections, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # The worker count caps how many requests hit the API at once
+        self.__executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='pot-fetch')
+
+    def fetch_user(self, chat_id):
+        response = self.__get(f'{self.base_url}/find/user/{chat_id}')
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_data(self, pot_id):
+        url = f'{self.base_url}/find/data/{pot_id}'
+        response = self.__get(url)
+        response.raise_for_status()
+        return response.json()
+
+    def conditional_get(self, url, validators=None, params=None):
+        """GET with If-None-Match/If-Modified-Since. Returns (response or None if unchanged, new validators)."""
+        validators = validators or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        response = self.__get(url, params=params, headers=headers)
+        if response.status_code == 304:
+            return None, validators
+        response.raise_for_status()
+        new_validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        return response, new_validators
+
+    def fetch_history(self, pot_id, since=None, validators=None):
+        """Conditional, incremental fetch. Returns (records or None if unchanged, new validators)."""
+        url = f'{self.base_url}/find/data/{pot_id}'
+        params = {'since': since} if since is not None else None
+        response, validators = self.conditional_get(url, validators, params)
+        return (response.json() if response is not None else None), validators
+
+    def image_url(self, pot_id):
+        return f'{self.base_url}/get/image/{pot_id}'
+
+    def submit(self, fetch, pot_id):
+        return self.__executor.submit(fetch, pot_id)
+
+    def submit_many(self, pot_ids, fetch=None):
+        """Starts `fetch(pot_id)` for all pots in parallel. Returns {pot_id: future}."""
+        fetch = fetch or self.fetch_data
+        futures = {pot_id: self.__executor.submit(fetch, pot_id) for pot_id in pot_ids}
+        logging.debug(f"Submitted {len(futures)} pot fetches")
+        return futures
+
+    def __get(self, url, **kwargs):
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = self.session.get(url, timeout=self.timeout, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            # Labelled by route ('find/data', 'get/image', ...) so the pot/chat id doesn't explode the series
+            endpoint = '/'.join(url[len(self.base_url):].strip('/').split('/')[:2])
+            metrics.observe('http_request_seconds', time.perf_counter() - started, endpoint=endpoint, status=status)
+
+    @staticmethod
+    def as_completed(futures):
+        """Yields (pot_id, future) from a submit_many() result in completion order."""
+        pot_ids = {future: pot_id for pot_id, future in futures.items()}
+        for future in as_completed(pot_ids):
+            yield pot_ids[future], future
+
+@st.cache_resource
+def get_pot_api_client():
+    # Cached resource -> one pooled session and thread pool per server process
+    return PotApiClient()
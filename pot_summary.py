@@ -0,0 +1,118 @@
+import streamlit as st
+import numpy as np
+import threading
+import time
+from collections import Counter
+from answer_cache import normalize
+from sensor_history import get_sensor_store
+
+CONTEXT_TOKEN_BUDGET = 400 # Roughly 4 characters per token
+SUMMARY_WINDOW = 48 # Most recent readings summarised per pot
+
+# Live-data words that tie a question to the user's pots. Pronouns alone ("daun tanaman saya")
+# don't: the answer cache ignores them, so they must not change the context either
+LIVE_DATA_WORDS = frozenset({
+    'potku', 'sensor', 'bacaan', 'data', 'deteksi', 'kamera', 'sekarang', 'kini', 'terakhir',
+})
+POT_OWNERS = frozenset({'saya', 'aku', 'ku', 'gue', 'kita', 'kami'})
+
+def is_about_own_pots(question):
+    """Whether answering `question` needs the user's pot data: "pot saya", "pot 3", "sensor", "sekarang".
+
+    Only these questions get the pot context; the rest are answered, and cached, without it,
+    so they can be shared across users and readings. "pot" alone doesn't count: "pupuk untuk
+    tomat dalam pot" is a general question.
+    """
+    words = normalize(question).split()
+    for i, word in enumerate(words):
+        if word in LIVE_DATA_WORDS:
+            return True
+        following = words[i + 1] if i + 1 < len(words) else ''
+        if word == 'pot' and (following in POT_OWNERS or following.isdigit()):
+            return True
+    return False
+
+class PotSummarizer:
+    """Compact, per-pot text summaries for the chat prompt.
+
+    Each summary is cached against the pot history's version and the latest detection
+    labels, so it is rebuilt only when new readings or detections arrive, not per question.
+    """
+
+    def __init__(self, store, token_budget=CONTEXT_TOKEN_BUDGET):
+        self.__store = store
+        self.__token_budget = token_budget
+        self.__summaries = {} # pot_id -> (cache key, summary line)
+        self.__labels = {} # pot_id -> (detected_at, [label, ...])
+        self.__lock = threading.Lock()
+
+    def record_detection(self, pot_id, labels):
+        with self.__lock:
+            self.__labels[pot_id] = (time.time(), list(labels))
+
+    def context(self, pot_ids):
+        """Summary lines for `pot_ids`, cut to fit the token budget."""
+        lines = []
+        budget_chars = self.__token_budget * 4
+        for i, pot_id in enumerate(pot_ids):
+            line = self.summary(pot_id)
+            if budget_chars - len(line) < 0:
+                lines.append(f'(dan {len(pot_ids) - i} pot lain)')
+                break
+            budget_chars -= len(line) + 1
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def question_context(self, question, pot_ids):
+        """context(pot_ids) if `question` is about the user's own pots, else ''."""
+        return self.context(pot_ids) if is_about_own_pots(question) else ''
+
+    def summary(self, pot_id):
+        history = self.__store.get(pot_id) # Served from the shared TTL cache
+        with self.__lock:
+            labels = self.__labels.get(pot_id)
+            key = (history.version, labels[0] if labels else None)
+            cached = self.__summaries.get(pot_id)
+            if cached and cached[0] == key:
+                return cached[1]
+
+        line = self.__build(pot_id, history, labels)
+        with self.__lock:
+            self.__summaries[pot_id] = (key, line)
+        return line
+
+    @classmethod
+    def __build(cls, pot_id, history, labels):
+        parts = [f'Pot {pot_id}:']
+        if len(history):
+            recent = history.latest(SUMMARY_WINDOW)
+            parts.append(cls.__describe('pH', recent['ph']))
+            parts.append(cls.__describe('kelembapan tanah', recent['soil']))
+            last_timestamp = history.last_timestamp
+            if last_timestamp is not None:
+                # Absolute time keeps the cached summary (and answer cache key) valid as time passes
+                parts.append(f"data terakhir {time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(last_timestamp))};")
+        else:
+            parts.append('belum ada data sensor;')
+
+        if labels:
+            counts = Counter(labels[1])
+            detected = ', '.join(f'{label} x{count}' for label, count in counts.most_common(5)) or 'tidak ada objek'
+            parts.append(f'deteksi gambar terakhir: {detected}.')
+        return ' '.join(parts)
+
+    @staticmethod
+    def __describe(name, values):
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return f'{name} tidak tersedia;'
+        text = f'{name} {values[-1]:g}'
+        if len(values) > 1:
+            text += f' (tren {values[-1] - values[0]:+.2f}, rentang {values.min():g}-{values.max():g}, ' \
+                    f'rata-rata {values.mean():.2f} dari {len(values)} bacaan)'
+        return text + ';'
+
+@st.cache_resource
+def get_pot_summarizer():
+    # Cached resource -> summaries are shared by every session watching the same pots
+    return PotSummarizer(get_sensor_store())
@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+from metrics import metrics
+
+# Empty string keeps readings in memory only
+SENSOR_DB_PATH = os.environ.get('SENSOR_DB_PATH', 'sensor_history.db')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS readings (
+    pot_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    ph REAL,
+    soil REAL,
+    PRIMARY KEY (pot_id, timestamp)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (
+    pot_id TEXT PRIMARY KEY,
+    last_raw_timestamp TEXT,
+    etag TEXT,
+    last_modified TEXT
+);
+'''
+
+class SensorDatabase:
+    """Append-only local store of pot readings (SQLite, WAL mode).
+
+    Rows are clustered by (pot_id, timestamp), so one pot's range scans and per-bucket
+    aggregates read a contiguous slice of the table. WAL lets the dashboard read while a
+    sync thread writes. Only readings with timestamps are stored.
+    """
+
+    FIELDS = ('ph', 'soil')
+
+    def __init__(self, path=SENSOR_DB_PATH):
+        self.path = path
+        self.__local = threading.local() # sqlite3 connections can't be shared between threads
+        self.__write_lock = threading.Lock()
+        connection = self.__connection()
+        connection.executescript(_SCHEMA)
+
+    def append(self, pot_id, timestamps, columns):
+        """Inserts readings; ones already stored (same pot and timestamp) are skipped."""
+        rows = zip([str(pot_id)] * len(timestamps), timestamps.tolist(),
+                   *(self.__nullable(columns[field]) for field in self.FIELDS))
+        with metrics.timer('sensor_db_seconds', op='append'), self.__write_lock, self.__connection() as connection:
+            connection.executemany('INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?)', rows)
+
+    def readings(self, pot_id, start=None, end=None, limit=None):
+        """(timestamps, {field: values}) of one pot between `start` and `end` (epoch seconds, inclusive).
+
+        With `limit`, only the newest `limit` of those readings, still in ascending order.
+        """
+        with metrics.timer('sensor_db_seconds', op='readings'):
+            rows = self.__connection().execute(
+                'SELECT * FROM (SELECT timestamp, ph, soil FROM readings WHERE pot_id = ? AND timestamp >= ? '
+                'AND timestamp <= ? ORDER BY timestamp DESC LIMIT ?) ORDER BY timestamp',
+                (str(pot_id), *self.__bounds(start, end), -1 if limit is None else limit)).fetchall()
+        data = np.array(rows, dtype=float).reshape(-1, 1 + len(self.FIELDS)) # None -> NaN
+        return data[:, 0].copy(), {field: data[:, i + 1].copy() for i, field in enumerate(self.FIELDS)}
+
+    def aggregate(self, pot_id, bucket_seconds, start=None, end=None):
+        """(bucket starts, {'<field>_<min|max|mean>': values}) per `bucket_seconds` bucket, computed in SQL."""
+        rows = self.__connection().execute(
+            'SELECT CAST(timestamp / :bucket AS INTEGER) * :bucket AS bucket, '
+            'MIN(ph), MAX(ph), AVG(ph), MIN(soil), MAX(soil), AVG(soil) FROM readings '
+            'WHERE pot_id = :pot_id AND timestamp >= :start AND timestamp <= :end GROUP BY bucket ORDER BY bucket',
+            dict(zip(('start', 'end'), self.__bounds(start, end)), bucket=bucket_seconds, pot_id=str(pot_id))).fetchall()
+        data = np.array(rows, dtype=float).reshape(-1, 1 + 3 * len(self.FIELDS))
+        names = [f'{field}_{stat}' for field in self.FIELDS for stat in ('min', 'max', 'mean')]
+        return data[:, 0].copy(), {name: data[:, i + 1].copy() for i, name in enumerate(names)}
+
+    def first_timestamp(self, pot_id):
+        """Epoch seconds of the pot's oldest stored reading, or None; an index lookup."""
+        row = self.__connection().execute('SELECT MIN(timestamp) FROM readings WHERE pot_id = ?', (str(pot_id),)).fetchone()
+        return row[0]
+
+    def sync_state(self, pot_id):
+        """(last raw timestamp, HTTP validators) saved by the last sync, or (None, {})."""
+        row = self.__connection().execute(
+            'SELECT last_raw_timestamp, etag, last_modified FROM sync_state WHERE pot_id = ?', (str(pot_id),)).fetchone()
+        if row is None:
+            return None, {}
+        # JSON keeps the type the API sent (int epoch vs ISO string) for ?since=
+        last_raw = json.loads(row[0]) if row[0] is not None else None
+        return last_raw, {'etag': row[1], 'last_modified': row[2]}
+
+    def save_sync_state(self, pot_id, last_raw_timestamp, validators):
+        last_raw = json.dumps(last_raw_timestamp) if last_raw_timestamp is not None else None
+        with self.__write_lock, self.__connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)',
+                               (str(pot_id), last_raw, validators.get('etag'), validators.get('last_modified')))
+
+    def __connection(self):
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL') # Durable across app crashes, fsync only at checkpoints
+            self.__local.connection = connection
+        return connection
+
+    @staticmethod
+    def __bounds(start, end):
+        return (-np.inf if start is None else float(start)), (np.inf if end is None else float(end))
+
+    @staticmethod
+    def __nullable(values):
+        # NaN is how the buffer marks a missing value; SQL aggregates should skip it
+        return [None if value != value else value for value in values.tolist()]
+
+def open_sensor_db(path=SENSOR_DB_PATH):
+    """The local store at `path`, or None (memory only) when disabled or it can't be opened."""
+    if not path:
+        return None
+    try:
+        return SensorDatabase(path)
+    except sqlite3.Error as e:
+        logging.warning(f'Sensor store {path} unavailable, keeping readings in memory only: {e}')
+        return None
@@ -0,0 +1,437 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pot_api import get_pot_api_client
+from sensor_db import open_sensor_db
+from shared_cache import TTLCache
+from downsample import minmax_indices
+from metrics import metrics
+
+# How often viewed pots are synced in the background, in seconds (0 disables)
+SENSOR_SYNC_SECONDS = float(os.environ.get('SENSOR_SYNC_SECONDS', 10))
+# Most readings held in memory per pot; older ones are read from the sensor database on demand
+SENSOR_MEMORY_READINGS = int(os.environ.get('SENSOR_MEMORY_READINGS', 10000))
+# Bucket sizes for charts of windows longer than the buffer; longer spans use multiples of the last
+CHART_BUCKET_SECONDS = (60, 5 * 60, 15 * 60, 60 * 60, 3 * 60 * 60, 6 * 60 * 60, 12 * 60 * 60,
+                        24 * 60 * 60, 2 * 24 * 60 * 60, 7 * 24 * 60 * 60)
+
+class SensorHistory:
+    """Columnar in-memory buffer of one pot's recent readings, synced incrementally from the API.
+
+    The buffer holds at most `max_readings`; older readings are dropped from memory. With a
+    SensorDatabase, every new timestamped reading is appended to the database as well, the
+    buffer starts from the newest stored readings, and charts reaching past the buffer are
+    bucketed in SQL once and then only extended from the buffer.
+    """
+
+    FIELDS = ('ph', 'soil')
+    TIMESTAMP_KEYS = ('timestamp', 'created_at', 'createdAt', 'time', 'date')
+
+    def __init__(self, pot_id, capacity=256, db=None, max_readings=SENSOR_MEMORY_READINGS):
+        self.pot_id = pot_id
+        self.version = 0 # Bumped on every append so derived views know when to recompute
+        self.sync_error = None # Last failed sync, cleared by the next successful one
+        self.__db = db
+        self.__max_readings = max_readings
+        self.__lock = threading.Lock()
+        self.__size = 0
+        self.__dropped = 0 # Readings trimmed from the front of the buffer
+        self.__older_in_db = False # Whether the database holds readings older than the buffer
+        self.__first_stored = None # Timestamp of the oldest stored reading, once needed
+        self.__stored_buckets = {} # bucket seconds -> (split, first bucket, buckets, data) of trimmed readings
+        self.__timestamps = np.full(capacity, np.nan)
+        self.__columns = {field: np.full(capacity, np.nan) for field in self.FIELDS}
+        self.__publish()
+        self.__last_raw_timestamp = None # As sent by the API, echoed back in ?since=
+        self.__upstream_count = 0 # Records seen when the API has no timestamps
+        self.__validators = {}
+        self.__chart_cache = {} # (kind, window_seconds, points or bucket) -> DataFrame, valid for self.__chart_version
+        self.__chart_version = None
+        if db is not None:
+            self.__load(db)
+
+    def __len__(self):
+        return self.__view[0]
+
+    @property
+    def has_timestamps(self):
+        return self.__last_raw_timestamp is not None
+
+    @property
+    def last_timestamp(self):
+        """Epoch seconds of the newest reading, or None without timestamps."""
+        size, timestamps, _, _, _ = self.__view
+        return float(timestamps[size - 1]) if self.has_timestamps and size else None
+
+    def sync(self, client):
+        """Pulls only readings newer than the last one held. Returns the number appended."""
+        with self.__lock:
+            try:
+                records, validators = client.fetch_history(self.pot_id, since=self.__last_raw_timestamp,
+                                                           validators=self.__validators)
+            except Exception as e:
+                self.sync_error = e
+                raise
+            self.sync_error = None
+            self.__validators = validators
+            if records is None: # 304 Not Modified
+                return 0
+            if not isinstance(records, list):
+                logging.warning(f"Invalid data format for pot {self.pot_id}: {records}")
+                return 0
+            records = [r for r in records if isinstance(r, dict)]
+            with metrics.timer('sensor_parse_seconds'):
+                appended = self.__append(self.__new_records(records))
+            if self.__db is not None and self.has_timestamps:
+                # Lets the next process resume with ?since= and the same validators
+                self.__db.save_sync_state(self.pot_id, self.__last_raw_timestamp, self.__validators)
+            return appended
+
+    def latest(self, count=2):
+        """Returns {field: np.ndarray} with up to `count` most recent values held in memory."""
+        size, _, columns, _, _ = self.__view
+        start = max(size - count, 0)
+        return {field: values[start:size].copy() for field, values in columns.items()}
+
+    def chart_frame(self, window_seconds=None, max_points=400):
+        """Downsampled readings for charting, cached until new data arrives.
+
+        The window is measured back from the newest reading (not wall-clock time), so the
+        result only changes when the buffer does. Ignored when readings have no timestamps.
+        Windows within the buffer keep the actual min/max readings; windows reaching past it
+        plot each bucket's min and max, with about `max_points` points either way.
+        """
+        self.__reset_chart_cache()
+        key = ('raw', window_seconds, max_points)
+        frame = self.__chart_cache.get(key)
+        if frame is not None:
+            return frame
+
+        with metrics.timer('chart_frame_seconds'):
+            start, end = self.__window_bounds(window_seconds)
+            if self.__reaches_db(start):
+                bucket = self.__chart_bucket(end - self.__first_timestamp(start), max(max_points // 2, 1))
+                buckets, data = self.__bucketed(bucket, start)
+                # Min and max of a bucket become two points, so peaks survive at any zoom level
+                times = np.concatenate([buckets, buckets + bucket / 2])
+                order = np.argsort(times, kind='stable')
+                values = {field: np.concatenate([data[f'{field}_min'], data[f'{field}_max']])[order]
+                          for field in self.FIELDS}
+                frame = pd.DataFrame(values, index=pd.to_datetime(times[order], unit='s', utc=True))
+            else:
+                frame = self.__raw_chart(start, max_points)
+            frame = frame.dropna()
+
+        self.__chart_cache[key] = frame
+        return frame
+
+    def aggregate_frame(self, bucket_seconds, window_seconds=None, max_points=None):
+        """Min/max/mean of each field per `bucket_seconds` bucket, cached until new data arrives.
+
+        With `max_points`, buckets are widened to a multiple of `bucket_seconds` so a long
+        window doesn't return more points than that. The window is measured back from the
+        newest reading, as in chart_frame. Returns None for readings without timestamps,
+        which can't be bucketed.
+        """
+        if not self.has_timestamps:
+            return None
+        self.__reset_chart_cache()
+        key = ('aggregate', window_seconds, bucket_seconds, max_points)
+        frame = self.__chart_cache.get(key)
+        if frame is not None:
+            return frame
+
+        with metrics.timer('aggregate_frame_seconds'):
+            start, end = self.__window_bounds(window_seconds)
+            if max_points and end is not None:
+                count = (end - self.__first_timestamp(start)) / bucket_seconds
+                bucket_seconds *= max(int(np.ceil(count / max_points)), 1)
+            buckets, data = self.__bucketed(bucket_seconds, start)
+            frame = pd.DataFrame(data, index=pd.to_datetime(buckets, unit='s', utc=True))
+
+        self.__chart_cache[key] = frame
+        return frame
+
+    def __window_bounds(self, window_seconds):
+        """(start or None for everything, newest timestamp) of a window; start is None without timestamps."""
+        end = self.last_timestamp
+        return (end - window_seconds if window_seconds and end is not None else None), end
+
+    def __reaches_db(self, start):
+        # Whether the window needs readings that were trimmed from the buffer
+        size, timestamps, _, _, older_in_db = self.__view
+        return older_in_db and size and (start is None or start < timestamps[0])
+
+    def __first_timestamp(self, start):
+        # Where the window's data begins, for sizing buckets
+        if start is not None:
+            return start
+        if self.__view[4]:
+            if self.__first_stored is None:
+                self.__first_stored = self.__db.first_timestamp(self.pot_id) # Index lookup; never changes
+            return self.__first_stored
+        return float(self.__view[1][0])
+
+    @staticmethod
+    def __chart_bucket(span, buckets):
+        # From a fixed ladder, so the bucket (and the cached database part) stays the same as
+        # the window slides forward
+        for bucket in CHART_BUCKET_SECONDS:
+            if span / bucket <= buckets:
+                return bucket
+        return CHART_BUCKET_SECONDS[-1] * int(np.ceil(span / buckets / CHART_BUCKET_SECONDS[-1]))
+
+    def __raw_chart(self, start, max_points):
+        size, timestamps, columns, dropped, _ = self.__view
+        first = int(np.searchsorted(timestamps[:size], start, side='left')) if start is not None else 0
+        series = [values[first:size] for values in columns.values()]
+        indices = minmax_indices(series, max_points) + first
+        data = {field: values[indices] for field, values in columns.items()}
+        if self.has_timestamps:
+            return pd.DataFrame(data, index=pd.to_datetime(timestamps[indices], unit='s', utc=True))
+        return pd.DataFrame(data, index=indices + dropped)
+
+    def __bucketed(self, bucket_seconds, start):
+        """(bucket starts, {'<field>_<min|max|mean>': values}) from `start` (None for everything).
+
+        Buckets are aligned to multiples of `bucket_seconds`. Those before the buffer come from
+        the database once and are cached: the readings in them never change, so each sync
+        only regroups the buffer.
+        """
+        size, timestamps, _, _, _ = self.__view
+        if not self.__reaches_db(start):
+            return self.__aggregate(bucket_seconds, start)
+
+        # Buckets from `split` on are grouped from the buffer, which holds every reading after it
+        split = np.ceil(timestamps[0] / bucket_seconds) * bucket_seconds
+        first_bucket = start // bucket_seconds * bucket_seconds if start is not None else None
+        cached = self.__stored_buckets.get(bucket_seconds)
+        covers = cached is not None and cached[0] == split and (
+            cached[1] is None or (first_bucket is not None and cached[1] <= first_bucket))
+        if not covers:
+            with metrics.timer('sensor_db_seconds', op='chart_buckets'):
+                buckets, data = self.__db.aggregate(self.pot_id, bucket_seconds, first_bucket, split)
+            before = buckets < split
+            cached = (split, first_bucket, buckets[before], {name: values[before] for name, values in data.items()})
+            if len(self.__stored_buckets) >= 8:
+                self.__stored_buckets.clear() # A handful of bucket sizes are in use at a time
+            self.__stored_buckets[bucket_seconds] = cached
+
+        _, _, buckets, data = cached
+        keep = buckets >= first_bucket if first_bucket is not None else slice(None)
+        recent_buckets, recent = self.__aggregate(bucket_seconds, split)
+        return (np.concatenate([buckets[keep], recent_buckets]),
+                {name: np.concatenate([values[keep], recent[name]]) for name, values in data.items()})
+
+    def __aggregate(self, bucket_seconds, start):
+        size, timestamps, columns, _, _ = self.__view
+        first = int(np.searchsorted(timestamps[:size], start, side='left')) if start is not None else 0
+        buckets = timestamps[first:size] // bucket_seconds * bucket_seconds
+        frame = pd.DataFrame({field: values[first:size] for field, values in columns.items()}, index=buckets)
+        grouped = frame.groupby(level=0).agg(['min', 'max', 'mean'])
+        return grouped.index.to_numpy(dtype=float), {f'{field}_{stat}': grouped[field][stat].to_numpy()
+                                                     for field in self.FIELDS for stat in ('min', 'max', 'mean')}
+
+    def __reset_chart_cache(self):
+        if self.__chart_version != self.version:
+            self.__chart_cache = {}
+            self.__chart_version = self.version
+
+    def __load(self, db):
+        # Cold start: serve the newest stored readings right away, then sync only what is newer.
+        # Loads what a trim keeps, so the first syncs don't trim (and re-bucket charts) again
+        limit = self.__max_readings * 3 // 4
+        timestamps, columns = db.readings(self.pot_id, limit=limit)
+        if not len(timestamps):
+            return
+        self.__older_in_db = len(timestamps) == limit
+        self.__last_raw_timestamp, self.__validators = db.sync_state(self.pot_id)
+        if self.__last_raw_timestamp is None:
+            self.__last_raw_timestamp = float(timestamps[-1])
+        self.__grow(len(timestamps))
+        self.__timestamps[:len(timestamps)] = timestamps
+        for field, values in self.__columns.items():
+            values[:len(timestamps)] = columns[field]
+        self.__size = len(timestamps)
+        self.__publish()
+        self.version += 1
+
+    def __new_records(self, records):
+        if self.has_timestamps:
+            # Once readings are timestamped, each record is checked on its own; falling back to
+            # counting would re-append the whole list and poison the buffer with NaN timestamps
+            timestamps = self.__parse_each(records)
+            valid = ~np.isnan(timestamps)
+            if not valid.all():
+                logging.warning(f"Dropping {int((~valid).sum())} reading(s) without a timestamp for pot {self.pot_id}")
+            # Works whether or not the API honours ?since= (it may send the full list)
+            last = self.__timestamps[self.__size - 1]
+            return [r for r, ts, ok in zip(records, timestamps, valid) if ok and ts > last]
+        if self.__parse_timestamps(records) is not None:
+            return records
+        # No timestamps: the API returns the full list, so skip what we already hold
+        new = records[self.__upstream_count:]
+        self.__upstream_count = max(self.__upstream_count, len(records))
+        return new
+
+    def __append(self, records):
+        if not records:
+            return 0
+        needed = self.__size + len(records)
+        if needed > len(self.__timestamps):
+            self.__grow(needed)
+
+        end = self.__size + len(records)
+        for field, values in self.__columns.items():
+            values[self.__size:end] = pd.to_numeric(pd.Series([r.get(field) for r in records], dtype=object),
+                                                     errors='coerce').to_numpy(dtype=float)
+        timestamps = self.__parse_timestamps(records)
+        if timestamps is not None:
+            self.__timestamps[self.__size:end] = timestamps
+            self.__last_raw_timestamp = self.__raw_timestamp(records[-1])
+            if self.__db is not None:
+                self.__db.append(self.pot_id, timestamps,
+                                 {field: values[self.__size:end] for field, values in self.__columns.items()})
+
+        self.__size = end
+        self.__trim()
+        self.__publish()
+        self.version += 1
+        return len(records)
+
+    def __publish(self):
+        # Readers don't take the lock; they unpack this tuple once, so they never pair a size
+        # with arrays it doesn't belong to. Writes past `size` in the published arrays are
+        # invisible to them, and growing or trimming always swaps in new arrays.
+        self.__view = (self.__size, self.__timestamps, self.__columns, self.__dropped, self.__older_in_db)
+
+    def __trim(self):
+        if self.__size <= self.__max_readings:
+            return
+        # Trim to 3/4 so the copy runs once per many syncs, not on every one
+        keep = self.__max_readings * 3 // 4
+        drop = self.__size - keep
+        # Fresh arrays rather than shifting the published ones in place; sized to the cap so a
+        # large first sync doesn't keep its capacity
+        self.__timestamps = self.__resized(self.__timestamps[drop:self.__size], self.__max_readings)
+        self.__columns = {field: self.__resized(values[drop:self.__size], self.__max_readings)
+                          for field, values in self.__columns.items()}
+        self.__size = keep
+        self.__dropped += drop
+        self.__older_in_db = self.__db is not None and self.has_timestamps
+
+    def __grow(self, needed):
+        capacity = max(needed, len(self.__timestamps) * 2)
+        self.__timestamps = self.__resized(self.__timestamps, capacity)
+        self.__columns = {field: self.__resized(values, capacity) for field, values in self.__columns.items()}
+
+    @staticmethod
+    def __resized(values, capacity):
+        grown = np.full(capacity, np.nan)
+        grown[:len(values)] = values
+        return grown
+
+    @classmethod
+    def __raw_timestamp(cls, record):
+        for key in cls.TIMESTAMP_KEYS:
+            if record.get(key) is not None:
+                return record[key]
+        return None
+
+    @classmethod
+    def __parse_timestamps(cls, records):
+        """Epoch seconds of every record, or None unless all of them have a parsable timestamp."""
+        if not records:
+            return None
+        timestamps = cls.__parse_each(records)
+        return None if np.isnan(timestamps).any() else timestamps
+
+    @classmethod
+    def __parse_each(cls, records):
+        """Epoch seconds per record, NaN where a record has no parsable timestamp."""
+        raw = [cls.__raw_timestamp(r) for r in records]
+        timestamps = np.full(len(raw), np.nan)
+        numeric = [i for i, value in enumerate(raw) if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        text = [i for i, value in enumerate(raw) if isinstance(value, str)]
+        if numeric:
+            timestamps[numeric] = [raw[i] for i in numeric]
+        if text:
+            parsed = pd.to_datetime([raw[i] for i in text], utc=True, errors='coerce')
+            # Epoch seconds as float64, independent of the parsed resolution; NaT becomes NaN
+            timestamps[text] = ((parsed - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+        return timestamps
+
+class SensorHistoryStore:
+    """Process-wide pot histories; N sessions watching one pot cost one upstream sync per TTL.
+
+    With a SensorDatabase, histories start from the stored readings and keep being served
+    from them while the API is unreachable. With `sync_interval`, a background thread
+    keeps recently viewed pots synced so dashboard reads don't wait on the API.
+    """
+
+    def __init__(self, client, ttl=5.0, max_pots=256, db=None, sync_interval=None, sync_idle=300):
+        self.__client = client
+        self.__max_pots = max_pots
+        self.__db = db
+        self.__histories = OrderedDict()
+        self.__viewed = {} # pot_id -> monotonic time of the last get()
+        self.__lock = threading.Lock()
+        self.cache = TTLCache(ttl=ttl, max_size=max_pots)
+        if sync_interval:
+            threading.Thread(target=self.__sync_loop, args=(sync_interval, sync_idle),
+                             name='sensor-sync', daemon=True).start()
+
+    def get(self, pot_id):
+        """Returns the pot's history, synced at most once per TTL across all sessions."""
+        self.__viewed[pot_id] = time.monotonic()
+        return self.cache.get_or_load(pot_id, self.__sync)
+
+    def stats(self):
+        return self.cache.stats()
+
+    def __sync(self, pot_id):
+        history = self.__history(pot_id)
+        try:
+            history.sync(self.__client)
+        except Exception as e:
+            if not len(history):
+                raise
+            # API down: serve the readings held locally instead of an error, retry after the TTL
+            logging.warning(f"Sync failed for pot {pot_id}, serving {len(history)} stored reading(s): {e}")
+        return history
+
+    def __sync_loop(self, interval, idle):
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            for pot_id, viewed_at in list(self.__viewed.items()):
+                if now - viewed_at > idle:
+                    # Nobody is looking at this pot any more
+                    self.__viewed.pop(pot_id, None)
+                    continue
+                try:
+                    # Outlives the next tick, so reads keep hitting the cache while this loop runs
+                    self.cache.put(pot_id, self.__sync(pot_id), ttl=interval * 2)
+                except Exception as e:
+                    logging.warning(f"Background sync failed for pot {pot_id}: {e}")
+
+    def __history(self, pot_id):
+        with self.__lock:
+            history = self.__histories.get(pot_id)
+            if history is None:
+                history = self.__histories[pot_id] = SensorHistory(pot_id, db=self.__db)
+            self.__histories.move_to_end(pot_id)
+            # Bounded: drop the least recently viewed pot's buffer
+            while len(self.__histories) > self.__max_pots:
+                self.__histories.popitem(last=False)
+            return history
+
+@st.cache_resource
+def get_sensor_store():
+    # Cached resource -> shared by every session in this server process
+    return SensorHistoryStore(get_pot_api_client(), db=open_sensor_db(), sync_interval=SENSOR_SYNC_SECONDS)
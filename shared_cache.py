@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and single-flight loading.
+
+    Concurrent `get_or_load` calls for the same missing key share one loader call.
+    """
+
+    def __init__(self, ttl=5.0, max_size=256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.__entries = OrderedDict() # key -> (expires_at, value)
+        self.__in_flight = {} # key -> Future
+        self.__lock = threading.Lock()
+        self.__counters = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+    def get_or_load(self, key, loader, ttl=None):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.__entries.move_to_end(key)
+                self.__counters['hits'] += 1
+                return entry[1]
+
+            future = self.__in_flight.get(key)
+            if future is not None:
+                # Someone else is already loading this key, wait for their result
+                self.__counters['coalesced'] += 1
+                owner = False
+            else:
+                future = Future()
+                self.__in_flight[key] = future
+                self.__counters['misses'] += 1
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader(key)
+        except BaseException as e:
+            with self.__lock:
+                del self.__in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self.__lock:
+            self.__store(key, value, self.ttl if ttl is None else ttl)
+            del self.__in_flight[key]
+        future.set_result(value)
+        return value
+
+    def get(self, key, default=None):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.__counters['misses'] += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.__counters['hits'] += 1
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        with self.__lock:
+            self.__store(key, value, self.ttl if ttl is None else ttl)
+
+    def invalidate(self, key):
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def stats(self):
+        with self.__lock:
+            return dict(self.__counters, size=len(self.__entries))
+
+    def __store(self, key, value, ttl):
+        self.__entries[key] = (time.monotonic() + ttl, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+            self.__counters['evictions'] += 1
@@ -0,0 +1,50 @@
+import time
+
+class StreamRenderer:
+    """Renders a token stream into a Streamlit container at a bounded rate.
+
+    Chunks are buffered in a list and the container is only re-rendered when
+    `min_interval` seconds have passed or `max_pending_chars` characters are waiting,
+    instead of once per chunk. `finalize` renders the full text exactly once more.
+    """
+
+    def __init__(self, container, min_interval=0.15, max_pending_chars=500, cursor='▌'):
+        self.__container = container
+        self.__min_interval = min_interval
+        self.__max_pending_chars = max_pending_chars
+        self.__cursor = cursor
+        self.__chunks = []
+        self.__pending_chars = 0
+        self.__last_flush = time.perf_counter()
+        self.__stats = {'chunks': 0, 'flushes': 0, 'render_time_s': 0.0, 'max_render_s': 0.0}
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        self.__chunks.append(chunk)
+        self.__pending_chars += len(chunk)
+        self.__stats['chunks'] += 1
+        if (self.__pending_chars >= self.__max_pending_chars
+                or time.perf_counter() - self.__last_flush >= self.__min_interval):
+            self.__render(self.text() + self.__cursor)
+
+    def finalize(self):
+        text = self.text()
+        self.__render(text)
+        return text
+
+    def text(self):
+        return ''.join(self.__chunks)
+
+    def stats(self):
+        return dict(self.__stats)
+
+    def __render(self, text):
+        start = time.perf_counter()
+        self.__container.markdown(text)
+        elapsed = time.perf_counter() - start
+        self.__stats['flushes'] += 1
+        self.__stats['render_time_s'] += elapsed
+        self.__stats['max_render_s'] = max(self.__stats['max_render_s'], elapsed)
+        self.__pending_chars = 0
+        self.__last_flush = time.perf_counter()